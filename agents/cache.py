@@ -0,0 +1,72 @@
+"""
+Cache persistente em disco (SQLite) com expiração por TTL
+Usado para respostas de APIs (Street View Metadata, Places, Geocoding)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+
+class DiskCache:
+    """
+    Armazena valores JSON por chave em uma tabela SQLite.
+
+    - Entradas mais antigas que `ttl_days` são ignoradas (e sobrescritas)
+    - Seguro para uso por múltiplas threads (conexão única + lock)
+    - Conta os hits (relatório de origem dos metadados do SearchAgent)
+    """
+
+    def __init__(self, path: Path, table: str, ttl_days: float = 30):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.table = table
+        self.ttl_seconds = ttl_days * 86400
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+        self.hits = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Retorna o valor cacheado ou None (ausente ou expirado).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+            if row is None or time.time() - row[1] > self.ttl_seconds:
+                return None
+
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        """
+        Grava (ou substitui) o valor da chave.
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, payload, time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,139 @@
+"""
+Priorização dos downloads Street View sob orçamento fixo
+Com max_sv_downloads limitado, a ordem dos candidatos decide o que é
+baixado: em vez da ordem de geração (Places e depois a grade em varredura
+raster), gasta o orçamento primeiro onde o match é mais provável e
+distribui o resto por toda a área.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+import numpy as np
+
+from .geo_utils import bearing_deg, haversine_m
+from .geocoder import normalize_place
+
+logger = logging.getLogger(__name__)
+
+# Valores que o VisionAgent usa para "não encontrado"
+_EMPTY_HINTS = {"", "nao visivel", "nenhum", "none", "null", "n/a"}
+
+
+def hint_terms(text_hints: Optional[Dict]) -> Set[str]:
+    """
+    Termos normalizados das dicas textuais (nome do condomínio, placas de
+    rua, outros textos), ignorando valores vazios/"não visível".
+    """
+    if not text_hints:
+        return set()
+
+    values = [text_hints.get("condo_name")]
+    for key in ("street_signs", "other_text"):
+        items = text_hints.get(key) or []
+        values.extend([items] if isinstance(items, str) else items)
+
+    terms = set()
+    for value in values:
+        if isinstance(value, str):
+            term = normalize_place(value)
+            if len(term) >= 3 and term not in _EMPTY_HINTS:
+                terms.add(term)
+    return terms
+
+
+class DownloadPlanner:
+    """
+    Ordena candidatos em camadas:
+    0. Resultados do Places cujo nome/endereço bate com as dicas textuais
+    1. Demais resultados do Places e pontos a até hint_radius_m de um
+       resultado da camada 0
+    2. Restante, estratificado: células (anel de ring_m × setor angular);
+       rodízio entre células, cada uma entregando o ponto mais próximo do
+       centro que ainda não saiu. Assim a cota cobre a área inteira, com
+       leve preferência pelo centro, em vez de esgotar num canto da grade.
+    """
+
+    def __init__(self, sectors: int = 8, ring_m: float = 500, hint_radius_m: float = 150):
+        self.sectors = sectors
+        self.ring_m = ring_m
+        self.hint_radius_m = hint_radius_m
+
+    def order(
+        self,
+        candidates: List[Dict],
+        center_lat: float,
+        center_lon: float,
+        text_hints: Optional[Dict] = None
+    ) -> List[int]:
+        """
+        Returns:
+            Índices de candidates na ordem de download
+        """
+        if not candidates:
+            return []
+
+        lats = np.array([c.get("sv_lat", c["lat"]) for c in candidates])
+        lons = np.array([c.get("sv_lon", c["lon"]) for c in candidates])
+        dist = haversine_m(center_lat, center_lon, lats, lons)
+
+        terms = hint_terms(text_hints)
+        is_place = np.array([
+            "places_api" in (c.get("sources") or [c.get("source")]) for c in candidates
+        ])
+        hint_match = np.array([
+            bool(terms) and self._matches(c, terms) for c in candidates
+        ])
+
+        tier = np.full(len(candidates), 2)
+        tier[is_place] = 1
+        if hint_match.any():
+            anchors = np.flatnonzero(hint_match)
+            near_anchor = (haversine_m(
+                lats[:, None], lons[:, None], lats[anchors][None, :], lons[anchors][None, :]
+            ) <= self.hint_radius_m).any(axis=1)
+            tier[near_anchor] = 1
+        tier[hint_match] = 0
+
+        ordered = []
+        for t in (0, 1):
+            idx = np.flatnonzero(tier == t)
+            ordered.extend(idx[np.argsort(dist[idx], kind="stable")].tolist())
+
+        rest = np.flatnonzero(tier == 2)
+        ordered.extend(self._stratified(rest, dist, lats, lons, center_lat, center_lon))
+
+        logger.info(
+            f"Prioridade de download: {int((tier == 0).sum())} por dica textual, "
+            f"{int((tier == 1).sum())} Places/vizinhos, {len(rest)} estratificados"
+        )
+        return ordered
+
+    def _stratified(self, idx, dist, lats, lons, center_lat, center_lon) -> List[int]:
+        if len(idx) == 0:
+            return []
+
+        rings = (dist[idx] // self.ring_m).astype(int)
+        angles = bearing_deg(center_lat, center_lon, lats[idx], lons[idx])
+        sectors = (angles // (360 / self.sectors)).astype(int) % self.sectors
+
+        # Fila por célula, do mais próximo ao mais distante do centro
+        cells = defaultdict(list)
+        for k in np.argsort(dist[idx], kind="stable"):
+            cells[(rings[k], sectors[k])].append(int(idx[k]))
+
+        # Rodízio: anéis internos primeiro dentro de cada rodada
+        queues = [cells[key] for key in sorted(cells)]
+        ordered = []
+        depth = 0
+        while len(ordered) < len(idx):
+            for queue in queues:
+                if depth < len(queue):
+                    ordered.append(queue[depth])
+            depth += 1
+        return ordered
+
+    @staticmethod
+    def _matches(cand: Dict, terms: Set[str]) -> bool:
+        text = normalize_place(f"{cand.get('name', '')} {cand.get('address', '')}")
+        return bool(text.strip()) and any(term in text for term in terms)
@@ -0,0 +1,168 @@
+"""
+Armazenamento persistente de embeddings CLIP (memory-mapped)
+Vetores ficam num arquivo float32 mapeado em memória e o índice
+(hash do conteúdo da imagem → linha) numa tabela SQLite: milhões de
+embeddings são consultados sem carregar tudo na RAM, e re-pontuar uma área
+já varrida não precisa de nenhuma inferência CLIP.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+
+# Linhas reservadas a mais a cada crescimento do arquivo de vetores
+_GROW_ROWS = 4096
+# Limite de parâmetros por consulta SQLite (IN (...))
+_QUERY_CHUNK = 500
+
+
+def file_digest(path: Path) -> str:
+    """
+    sha1 do conteúdo do arquivo (identidade da imagem, não do nome).
+    """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Layout em disco (um diretório por modelo):
+        <root>/<modelo>/vectors.f32   matriz (capacidade, dim) float32
+        <root>/<modelo>/index.sqlite  hash → linha
+
+    Trocar de modelo (ou de pesos) usa outro diretório, então embeddings
+    de modelos diferentes nunca se misturam. Vários processos podem
+    escrever (ex: shards do precrawl.py): cada escrita reserva as linhas
+    dentro de uma transação IMMEDIATE, e o vetor é gravado antes do índice
+    (uma interrupção no meio nunca deixa uma linha indexada sem vetor).
+    """
+
+    def __init__(self, root: Path, model: str, dim: int):
+        self.dir = Path(root) / re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self.dir.mkdir(exist_ok=True, parents=True)
+        self.model = model
+        self.dim = dim
+        self.vectors_path = self.dir / "vectors.f32"
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.dir / "index.sqlite"), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+        )
+
+        self.vectors_path.touch(exist_ok=True)
+        self._vectors = None
+        self._map()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _map(self):
+        """
+        (Re)mapeia o arquivo de vetores com o tamanho atual em disco.
+        """
+        rows = self.vectors_path.stat().st_size // (self.dim * 4)
+        self._vectors = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+            if rows else np.empty((0, self.dim), dtype=np.float32)
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def get_many(self, digests: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Embeddings conhecidos (hash → vetor); hashes ausentes não aparecem.
+        """
+        found = {}
+        unique = list(dict.fromkeys(digests))
+
+        with self._lock:
+            for i in range(0, len(unique), _QUERY_CHUNK):
+                chunk = unique[i:i + _QUERY_CHUNK]
+                found.update(self._conn.execute(
+                    f"SELECT hash, row FROM vectors WHERE hash IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+
+            if found and max(found.values()) >= len(self._vectors):
+                self._map()  # outro processo aumentou o arquivo
+            vectors = {h: np.array(self._vectors[row]) for h, row in found.items()}
+
+            self.hits += len(vectors)
+            self.misses += len(unique) - len(vectors)
+
+        return vectors
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def put_many(self, digests: List[str], embeddings: np.ndarray):
+        """
+        Grava embeddings novos (hashes já presentes são ignorados).
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                new = {}
+                for h, emb in zip(digests, embeddings):
+                    if h not in new:
+                        new[h] = emb
+                keys = list(new)
+                for i in range(0, len(keys), _QUERY_CHUNK):
+                    chunk = keys[i:i + _QUERY_CHUNK]
+                    for (h,) in self._conn.execute(
+                        f"SELECT hash FROM vectors WHERE hash IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    ):
+                        new.pop(h, None)
+
+                if not new:
+                    self._conn.execute("COMMIT")
+                    return
+
+                start = self._conn.execute(
+                    "SELECT COALESCE(MAX(row) + 1, 0) FROM vectors"
+                ).fetchone()[0]
+                end = start + len(new)
+
+                self._map()
+                if end > len(self._vectors):
+                    with open(self.vectors_path, "r+b") as f:
+                        f.truncate((end + _GROW_ROWS) * self.dim * 4)
+                    self._map()
+
+                self._vectors[start:end] = np.stack(list(new.values()))
+                self._vectors.flush()
+
+                self._conn.executemany(
+                    "INSERT INTO vectors (hash, row) VALUES (?, ?)",
+                    zip(new, range(start, end))
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            self._vectors = None
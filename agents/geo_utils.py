@@ -0,0 +1,153 @@
+"""
+Utilitários geográficos vetorizados (NumPy)
+Distâncias, grades de busca e conversões metro ↔ grau
+"""
+
+from typing import List, Tuple
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # raio da Terra em metros
+METERS_PER_DEG_LAT = 111000  # conversão aproximada: 1 grau = ~111km
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Distância haversine em metros.
+
+    Aceita escalares ou arrays NumPy (com broadcasting).
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    a = np.sin(delta_phi / 2) ** 2 + \
+        np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return EARTH_RADIUS_M * c
+
+
+def bearing_deg(lat1, lon1, lat2, lon2):
+    """
+    Azimute inicial (0-360°, a partir do norte) de 1 para 2.
+
+    Aceita escalares ou arrays NumPy.
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_lambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    x = np.sin(delta_lambda) * np.cos(phi2)
+    y = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(delta_lambda)
+
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def deg_per_m(lat: float) -> Tuple[float, float]:
+    """
+    Graus por metro (lat, lon) na latitude informada.
+    """
+    return 1 / METERS_PER_DEG_LAT, 1 / (METERS_PER_DEG_LAT * np.cos(np.radians(lat)))
+
+
+def generate_grid(
+    center_lat: float,
+    center_lon: float,
+    radius_m: float,
+    spacing_m: float,
+    layout: str = "square",
+    inner_radius_m: float = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gera grade de pontos dentro de um círculo (ou anel) ao redor do centro.
+
+    Tudo é calculado com meshgrid + máscara de distância haversine,
+    sem laços Python.
+
+    Args:
+        spacing_m: espaçamento entre pontos vizinhos (metros)
+        layout: "square" (grade quadrada) ou "hex" (empacotamento hexagonal:
+            nenhum ponto da área fica a mais de spacing/√3 de uma amostra,
+            contra spacing/√2 na grade quadrada)
+        inner_radius_m: se > 0, descarta pontos a até essa distância do
+            centro (busca em anel)
+
+    Returns:
+        (lats, lons) como arrays NumPy 1-D
+    """
+    if layout not in ("square", "hex"):
+        raise ValueError(f"Layout de grid inválido: {layout}")
+
+    dlat, dlon = deg_per_m(center_lat)
+
+    # Linhas (norte-sul) e colunas (leste-oeste) em metros
+    row_step = spacing_m * np.sqrt(3) / 2 if layout == "hex" else spacing_m
+    n_rows = int(np.ceil(radius_m / row_step))
+    n_cols = int(np.ceil(radius_m / spacing_m)) + 1
+
+    rows = np.arange(-n_rows, n_rows + 1)
+    cols = np.arange(-n_cols, n_cols + 1)
+    row_idx, col_idx = np.meshgrid(rows, cols, indexing="ij")
+
+    y_m = row_idx * row_step
+    x_m = col_idx * spacing_m
+    if layout == "hex":
+        # Linhas ímpares deslocadas em meio espaçamento
+        x_m = x_m + (row_idx % 2) * (spacing_m / 2)
+
+    lats = center_lat + y_m.ravel() * dlat
+    lons = center_lon + x_m.ravel() * dlon
+
+    # Máscara: manter apenas pontos dentro do círculo/anel
+    dist = haversine_m(center_lat, center_lon, lats, lons)
+    mask = (dist <= radius_m) & (dist > inner_radius_m)
+
+    return lats[mask], lons[mask]
+
+
+def cluster_points(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    radius_m: float,
+    weights: np.ndarray = None
+) -> List[Tuple[float, float, int]]:
+    """
+    Agrupamento guloso por líder: percorre os pontos na ordem dada (ex: por
+    score decrescente); cada ponto entra no primeiro cluster cujo líder
+    está a até radius_m, senão abre um cluster novo.
+
+    Returns:
+        [(lat, lon, n_pontos)] na ordem de criação; o centro é a média
+        (ponderada por weights, se houver) dos membros
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if weights is None:
+        weights = np.ones(len(lats))
+    else:
+        weights = np.clip(np.asarray(weights, dtype=float), 1e-6, None)
+
+    labels = np.full(len(lats), -1)
+    leaders = []
+    for i in range(len(lats)):
+        if leaders:
+            leader_idx = np.array(leaders)
+            dist = haversine_m(lats[i], lons[i], lats[leader_idx], lons[leader_idx])
+            nearest = int(np.argmin(dist))
+            if dist[nearest] <= radius_m:
+                labels[i] = nearest
+                continue
+        labels[i] = len(leaders)
+        leaders.append(i)
+
+    clusters = []
+    for k in range(len(leaders)):
+        members = labels == k
+        w = weights[members]
+        clusters.append((
+            float(np.average(lats[members], weights=w)),
+            float(np.average(lons[members], weights=w)),
+            int(members.sum())
+        ))
+    return clusters
@@ -0,0 +1,202 @@
+"""
+Geocodificação com gazetteer local + cache persistente
+Resolve "bairro, cidade, estado" sem ida à rede sempre que possível
+"""
+
+import logging
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import requests
+
+from config import GOOGLE_KEY, SEARCH_CONFIG, CACHE_DIR, CACHE_CONFIG, API_CONFIG
+from .cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# Memoização em processo (compartilhada entre instâncias)
+_MEMO: Dict[str, Dict] = {}
+_MEMO_LOCK = threading.Lock()
+
+# Linha de tabela markdown: | Nome | -23.6505 | -46.7085 | ...
+_TABLE_ROW = re.compile(
+    r"^\|\s*\**(?P<name>[^|*]+?)\**\s*\|\s*(?P<lat>-?\d+\.\d+)\s*\|\s*(?P<lon>-?\d+\.\d+)\s*\|"
+)
+
+
+def normalize_place(text: str) -> str:
+    """
+    Normaliza nome de lugar: minúsculas, sem acentos, espaços simples.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def load_gazetteer(path: Path) -> Dict[str, Tuple[float, float]]:
+    """
+    Lê tabelas no formato de COORDENADAS_BAIRROS_SP.md
+    (| Bairro | Latitude | Longitude | ... |).
+    """
+    entries = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            m = _TABLE_ROW.match(line.strip())
+            if m:
+                entries[normalize_place(m["name"])] = (float(m["lat"]), float(m["lon"]))
+    return entries
+
+
+class Geocoder:
+    """
+    Resolve endereços textuais em coordenadas, nesta ordem:
+    1. Memoização em processo
+    2. Gazetteer local (bairros conhecidos, sem rede)
+    3. Cache persistente em disco (inclui falhas conhecidas)
+    4. Google Geocoding API
+    """
+
+    def __init__(self):
+        self.api_key = GOOGLE_KEY
+        self.geocode_url = f"{API_CONFIG['maps_base_url']}/maps/api/geocode/json"
+
+        # Gazetteers: {bairro normalizado: (lat, lon)} + aliases da cidade
+        self.gazetteers = []
+        for gaz in SEARCH_CONFIG["gazetteers"]:
+            path = Path(gaz["file"])
+            if not path.exists():
+                logger.warning(f"Gazetteer não encontrado: {path}")
+                continue
+            self.gazetteers.append({
+                "entries": load_gazetteer(path),
+                "city_aliases": {normalize_place(gaz["city"]), normalize_place(gaz["state"])}
+            })
+
+        self.cache = None
+        if CACHE_CONFIG["enabled"] and CACHE_CONFIG["cache_geocoding"]:
+            self.cache = DiskCache(
+                CACHE_DIR / "geocode.sqlite",
+                table="geocode",
+                ttl_days=CACHE_CONFIG["ttl_days"]
+            )
+
+        n_entries = sum(len(g["entries"]) for g in self.gazetteers)
+        logger.info(f"Geocoder inicializado ({n_entries} lugares no gazetteer)")
+
+    def geocode(self, address: str) -> Optional[Tuple[float, float]]:
+        """
+        Geocodifica um endereço. Retorna (lat, lon) ou None.
+        """
+        result = self._lookup_offline(address)
+        if result is None:
+            result = self._fetch(address)
+        return self._as_coords(result)
+
+    def resolve_first(
+        self,
+        addresses: List[str]
+    ) -> Tuple[Optional[Tuple[float, float]], Optional[str]]:
+        """
+        Resolve a primeira tentativa geocodificável de uma lista de fallbacks.
+
+        Todas as tentativas são consultadas offline (memo/gazetteer/cache)
+        antes de qualquer requisição; a rede só é usada para tentativas
+        ainda desconhecidas, respeitando a ordem de preferência.
+
+        Returns:
+            ((lat, lon), tentativa_usada) ou (None, None)
+        """
+        offline = {addr: self._lookup_offline(addr) for addr in addresses}
+
+        for addr in addresses:
+            result = offline[addr]
+            if result is None:
+                logger.info(f"   Tentando: {addr}")
+                result = self._fetch(addr)
+            else:
+                logger.info(f"   Tentando: {addr} (offline: {result['source']})")
+
+            coords = self._as_coords(result)
+            if coords is not None:
+                return coords, addr
+            logger.info(f"   ❌ Falhou: {result.get('status')}")
+
+        return None, None
+
+    def _lookup_offline(self, address: str) -> Optional[Dict]:
+        key = normalize_place(address)
+
+        with _MEMO_LOCK:
+            if key in _MEMO:
+                return _MEMO[key]
+
+        result = self._lookup_gazetteer(key)
+        if result is None and self.cache is not None:
+            result = self.cache.get(key)
+            if result is not None:
+                result["source"] = "cache"
+
+        if result is not None:
+            with _MEMO_LOCK:
+                _MEMO[key] = result
+
+        return result
+
+    def _lookup_gazetteer(self, key: str) -> Optional[Dict]:
+        """
+        "bairro, cidade, UF" → coordenadas do gazetteer, se o bairro for
+        conhecido e os demais componentes forem a própria cidade/UF.
+        """
+        parts = [p.strip() for p in key.split(",") if p.strip()]
+        if not parts:
+            return None
+
+        for gaz in self.gazetteers:
+            coords = gaz["entries"].get(parts[0])
+            if coords and all(p in gaz["city_aliases"] for p in parts[1:]):
+                return {"status": "OK", "lat": coords[0], "lon": coords[1], "source": "gazetteer"}
+
+        return None
+
+    def _fetch(self, address: str) -> Dict:
+        """
+        Google Geocoding API (resultado memoizado e cacheado em disco).
+        """
+        params = {
+            "address": address,
+            "key": self.api_key,
+            "region": "br"  # Priorizar Brasil
+        }
+
+        try:
+            r = requests.get(self.geocode_url, params=params, timeout=20)
+            r.raise_for_status()
+            data = r.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Erro ao geocodificar '{address}': {e}")
+            return {"status": "ERROR"}
+
+        status = data.get("status")
+        if status == "OK":
+            location = data["results"][0]["geometry"]["location"]
+            result = {"status": "OK", "lat": location["lat"], "lon": location["lng"]}
+        else:
+            result = {"status": status}
+
+        # Só memoizar/cachear respostas definitivas
+        if status in ("OK", "ZERO_RESULTS"):
+            key = normalize_place(address)
+            if self.cache is not None:
+                self.cache.set(key, result)
+            with _MEMO_LOCK:
+                _MEMO[key] = dict(result, source="memo")
+
+        return dict(result, source="api")
+
+    @staticmethod
+    def _as_coords(result: Optional[Dict]) -> Optional[Tuple[float, float]]:
+        if result and result.get("status") == "OK":
+            return result["lat"], result["lon"]
+        return None
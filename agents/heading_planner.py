@@ -0,0 +1,196 @@
+"""
+Planejamento de headings do Street View a partir da direção da rua
+Fachadas ficam quase sempre perpendiculares à via: em vez de varrer os 8
+headings, pede só as vistas esquerda/direita (e, opcionalmente, diagonais).
+"""
+
+import logging
+from typing import Dict, List, Optional
+import numpy as np
+
+from .geo_utils import bearing_deg, deg_per_m, haversine_m
+
+logger = logging.getLogger(__name__)
+
+
+def bearing_from_points(
+    lat: float,
+    lon: float,
+    lats: np.ndarray,
+    lons: np.ndarray,
+    min_linearity: float = 4.0
+) -> Optional[float]:
+    """
+    Direção principal (0-180°) de um conjunto de panos vizinhos via PCA.
+
+    Panos vizinhos se alinham ao longo da rua; se a nuvem não for
+    suficientemente alongada (cruzamentos, praças), retorna None.
+    """
+    if len(lats) < 3:
+        return None
+
+    dlat, dlon = deg_per_m(lat)
+    xy = np.column_stack([(lons - lon) / dlon, (lats - lat) / dlat])
+    xy = xy - xy.mean(axis=0)
+
+    eigvals, eigvecs = np.linalg.eigh(np.cov(xy.T))
+    if eigvals[1] <= 0 or eigvals[1] < min_linearity * max(eigvals[0], 1e-6):
+        return None
+
+    vx, vy = eigvecs[:, 1]
+    return float(np.degrees(np.arctan2(vx, vy)) % 180)
+
+
+def target_headings(
+    pano_lat: float,
+    pano_lon: float,
+    target_lat: float,
+    target_lon: float,
+    views: int = 1,
+    fov: int = 90
+) -> List[int]:
+    """
+    Headings mirando um alvo conhecido (ex: local de um resultado do Places).
+
+    views=1 → exatamente no alvo; views=2 → ±fov/4 em torno dele (as duas
+    imagens juntas cobrem 1.5×fov centrado no alvo).
+    """
+    bearing = float(bearing_deg(pano_lat, pano_lon, target_lat, target_lon))
+    offsets = [0] if views == 1 else [-fov / 4, fov / 4]
+    return sorted({int(round(bearing + o)) % 360 for o in offsets})
+
+
+def facade_headings(road_bearing: float, diagonals: bool = False) -> List[int]:
+    """
+    Headings perpendiculares à rua (os dois lados) e, opcionalmente,
+    as diagonais a ±45° de cada um.
+    """
+    offsets = [90, 270]
+    if diagonals:
+        offsets += [45, 135, 225, 315]
+    return sorted({int(round(road_bearing + o)) % 360 for o in offsets})
+
+
+class HeadingPlanner:
+    """
+    Define, por candidato, a lista de headings a baixar:
+    1. Resultados do Places → mirar direto no local do resultado
+       (pano colado ao alvo, < min_target_dist_m, cai nas regras seguintes)
+    2. Direção da rua pelo extrato OSM (RoadSampler), se houver
+    3. Senão, PCA dos panos vizinhos (índice local + os próprios candidatos),
+       num raio de pelo menos spacing_factor × espaçamento da amostragem
+       (com raio menor que o espaçamento quase nunca há 3 vizinhos)
+    4. Senão, a direção do "snap": o pano mais próximo de um ponto da
+       grade fica no pé da perpendicular à rua, então o vetor pano → ponto
+       (se tiver pelo menos snap_min_m) é perpendicular à via
+    5. Sem direção confiável ou vizinhos insuficientes → varredura
+       completa (SEARCH_CONFIG["sv_headings"])
+    """
+
+    def __init__(
+        self,
+        full_sweep: List[int],
+        road_sampler=None,
+        pano_index=None,
+        neighbor_radius_m: float = 30,
+        spacing_factor: float = 1.5,
+        snap_min_m: float = 20,
+        diagonals: bool = False,
+        target_views: int = 1,
+        fov: int = 90,
+        min_target_dist_m: float = 3
+    ):
+        self.full_sweep = list(full_sweep)
+        self.road_sampler = road_sampler
+        self.pano_index = pano_index
+        self.neighbor_radius_m = neighbor_radius_m
+        self.spacing_factor = spacing_factor
+        self.snap_min_m = snap_min_m
+        self.diagonals = diagonals
+        self.target_views = target_views
+        self.fov = fov
+        self.min_target_dist_m = min_target_dist_m
+
+    def plan(self, candidates: List[Dict], spacing_m: float = None):
+        """
+        Preenche cand["road_bearing"] e cand["headings"] (se ainda ausentes).
+        
+        spacing_m: espaçamento da grade que gerou os candidatos (define o
+        raio dos vizinhos usados na PCA)
+        """
+        radius_m = self.neighbor_radius_m
+        if spacing_m:
+            radius_m = max(radius_m, self.spacing_factor * spacing_m)
+        
+        cand_lats = np.array([c.get("sv_lat", c["lat"]) for c in candidates])
+        cand_lons = np.array([c.get("sv_lon", c["lon"]) for c in candidates])
+
+        planned = targeted = 0
+        for cand, lat, lon in zip(candidates, cand_lats, cand_lons):
+            if cand.get("headings"):
+                continue
+
+            # Alvo conhecido: mirar do pano para o local do resultado do Places
+            if self.target_views and cand.get("source") == "places_api" and haversine_m(
+                lat, lon, cand["lat"], cand["lon"]
+            ) >= self.min_target_dist_m:
+                cand["headings"] = target_headings(
+                    lat, lon, cand["lat"], cand["lon"], self.target_views, self.fov
+                )
+                targeted += 1
+                continue
+
+            bearing = self._road_bearing(lat, lon, cand_lats, cand_lons, radius_m)
+            if bearing is None and cand.get("source") != "places_api":
+                bearing = self._snap_bearing(lat, lon, cand["lat"], cand["lon"])
+            cand["road_bearing"] = bearing
+
+            if bearing is None:
+                cand["headings"] = self.full_sweep
+            else:
+                cand["headings"] = facade_headings(bearing, self.diagonals)
+                planned += 1
+
+        logger.info(
+            f"Headings planejados: {targeted} mirando o alvo (Places), "
+            f"{planned} pela direção da rua, "
+            f"{len(candidates) - targeted - planned} com varredura completa"
+        )
+
+    def _road_bearing(
+        self,
+        lat: float,
+        lon: float,
+        cand_lats: np.ndarray,
+        cand_lons: np.ndarray,
+        radius_m: float
+    ) -> Optional[float]:
+        if self.road_sampler is not None:
+            bearing = self.road_sampler.bearing_at(lat, lon)
+            if bearing is not None:
+                return bearing
+
+        # Vizinhos: candidatos desta busca + panos já conhecidos do índice
+        mask = haversine_m(lat, lon, cand_lats, cand_lons) <= radius_m
+        points = {(round(a, 6), round(b, 6)) for a, b in zip(cand_lats[mask], cand_lons[mask])}
+        if self.pano_index is not None:
+            points |= {
+                (round(p["lat"], 6), round(p["lon"], 6))
+                for p in self.pano_index.panos_within(lat, lon, radius_m)
+            }
+        if len(points) < 3:
+            return None
+
+        lats, lons = (np.array(v) for v in zip(*points))
+        return bearing_from_points(lat, lon, lats, lons)
+
+    def _snap_bearing(
+        self,
+        pano_lat: float,
+        pano_lon: float,
+        point_lat: float,
+        point_lon: float
+    ) -> Optional[float]:
+        if haversine_m(pano_lat, pano_lon, point_lat, point_lon) < self.snap_min_m:
+            return None
+        return float((bearing_deg(pano_lat, pano_lon, point_lat, point_lon) + 90) % 180)
@@ -0,0 +1,60 @@
+"""
+Armazenamento de imagens Street View endereçado por conteúdo
+Cada imagem é identificada por (pano_id, heading, fov, size) — nunca pelo
+índice do candidato na execução atual — e pode ser reutilizada com
+segurança entre execuções, bairros e raios diferentes.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+
+class StreetViewImageStore:
+    """
+    Layout em disco:
+        <root>/<2 primeiros hex>/<sha1 da chave>.jpg
+
+    O hash evita colisões de nomes em sistemas de arquivos que não
+    diferenciam maiúsculas/minúsculas (pano_ids são case-sensitive).
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(exist_ok=True, parents=True)
+
+    @staticmethod
+    def key(
+        pano_id: Optional[str],
+        heading: float,
+        fov: int,
+        size: str,
+        lat: float = None,
+        lon: float = None
+    ) -> str:
+        """
+        Chave lógica da imagem.
+
+        Sem pano_id, usa a localização (6 casas decimais) como identidade.
+        """
+        if pano_id:
+            origin = f"pano:{pano_id}"
+        else:
+            origin = f"loc:{lat:.6f},{lon:.6f}"
+        return f"{origin}|h{int(round(heading)) % 360}|f{int(fov)}|{size}"
+
+    def relpath(self, *args, **kwargs) -> str:
+        """
+        Caminho relativo à raiz (é o que vai na coluna "filename").
+        """
+        digest = hashlib.sha1(self.key(*args, **kwargs).encode("utf-8")).hexdigest()
+        return f"{digest[:2]}/{digest}.jpg"
+
+    def resolve(self, relpath: str) -> Path:
+        """
+        Caminho absoluto de uma imagem do store.
+        """
+        return self.root / relpath
+
+    def exists(self, relpath: str) -> bool:
+        return self.resolve(relpath).exists()
@@ -0,0 +1,105 @@
+"""
+Journal de execução (JSONL append-only) para retomar buscas interrompidas
+Cada consulta de metadados e cada imagem concluída vira uma linha assim que
+termina; uma execução interrompida (crash, desconexão do Colab) relê o
+journal e continua exatamente de onde parou, inclusive no orçamento de
+downloads já gasto.
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Respostas definitivas da Metadata API (erros/cota são refeitos)
+_DEFINITIVE = ("OK", "ZERO_RESULTS", "NOT_FOUND")
+
+
+class RunJournal:
+    """
+    Linhas do arquivo:
+        {"t": "meta", "lat": ..., "lon": ..., "meta": {...}}
+        {"t": "img", "filename": ..., "row": {...}}
+
+    Só imagens baixadas nesta execução entram no journal (consumiram
+    orçamento); as reaproveitadas do image store não precisam.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Dict] = {}
+        self._images: Dict[str, Dict] = {}
+
+        if self.path.exists():
+            self._replay()
+
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # última linha truncada pela interrupção
+                if entry.get("t") == "meta":
+                    self._meta[self._key(entry["lat"], entry["lon"])] = entry["meta"]
+                elif entry.get("t") == "img":
+                    self._images[entry["filename"]] = entry
+
+        if not (self._meta or self._images):
+            return
+        logger.info(
+            f"♻️  Retomando execução interrompida: {len(self._meta)} consultas de metadados "
+            f"e {len(self._images)} imagens já concluídas"
+        )
+
+    @staticmethod
+    def _key(lat: float, lon: float) -> str:
+        return f"{lat:.7f},{lon:.7f}"
+
+    def _append(self, entry: Dict):
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    # ------------------------------------------------------------------
+    # Metadados
+    # ------------------------------------------------------------------
+
+    def meta(self, lat: float, lon: float) -> Optional[Dict]:
+        return self._meta.get(self._key(lat, lon))
+
+    def record_meta(self, lat: float, lon: float, meta: Dict):
+        if meta.get("status") not in _DEFINITIVE:
+            return
+        self._meta[self._key(lat, lon)] = meta
+        self._append({"t": "meta", "lat": lat, "lon": lon, "meta": meta})
+
+    # ------------------------------------------------------------------
+    # Imagens
+    # ------------------------------------------------------------------
+
+    def has_image(self, filename: str) -> bool:
+        return filename in self._images
+
+    def record_image(self, filename: str, row: Dict):
+        entry = {"t": "img", "filename": filename, "row": row}
+        self._images[filename] = entry
+        self._append(entry)
+
+    def close(self, discard: bool = False):
+        """
+        Fecha o journal; discard=True apaga o arquivo (execução concluída).
+        """
+        with self._lock:
+            self._file.close()
+        if discard:
+            self.path.unlink(missing_ok=True)
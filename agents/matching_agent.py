@@ -3,9 +3,14 @@ Agente 3: Matching Visual (CLIP + SIFT/RANSAC)
 Compara foto do usuário com Street Views usando embeddings + geometria
 """
 
+import json
 import logging
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 import numpy as np
 import cv2
 import torch
@@ -14,15 +19,221 @@ from PIL import Image
 from tqdm import tqdm
 import pandas as pd
 
-from config import ML_CONFIG
+from config import ML_CONFIG, CACHE_DIR, CACHE_CONFIG
+from .image_store import StreetViewImageStore
+from .embedding_store import EmbeddingStore, file_digest
+from .region_index import RegionIndex
 
 logger = logging.getLogger(__name__)
 
 
+def export_dir(model_name: str, pretrained: str) -> Path:
+    """
+    Diretório dos artefatos exportados (export_clip.py) de um modelo.
+    """
+    return ML_CONFIG["clip_export_dir"] / re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{model_name}-{pretrained}")
+
+
+def select_top_k(scores: np.ndarray, k: int = None, min_score: float = None) -> np.ndarray:
+    """
+    Índices dos (até) k maiores scores >= min_score, em ordem decrescente.
+    
+    argpartition separa o top-K em O(n); só os K escolhidos são ordenados.
+    """
+    idx = np.arange(len(scores)) if min_score is None else np.flatnonzero(scores >= min_score)
+    if k is not None and len(idx) > k:
+        idx = idx[np.argpartition(-scores[idx], k - 1)[:k]]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class ClipEncoder:
+    """
+    Modelo OpenCLIP + caches de embeddings (memória por caminho, disco por
+    conteúdo da imagem). O MatchingAgent usa um encoder principal e,
+    na cascata, um segundo encoder pequeno de triagem.
+    
+    backend:
+        "torch"        modelo PyTorch original (fp32, autocast na GPU)
+        "onnx"         torre de imagem ONNX int8 (ONNX Runtime, CPU)
+        "torchscript"  torre de imagem TorchScript bf16 (CPU)
+    Os artefatos vêm de export_clip.py.
+    """
+    
+    def __init__(self, model_name: str, pretrained: str, device: str, backend: str = "torch"):
+        self.name = model_name
+        self.backend = backend
+        self.device = device
+        self.session = None
+        
+        if backend == "torch":
+            logger.info(f"Carregando {model_name}...")
+            self.model, _, self.preprocess = open_clip.create_model_and_transforms(
+                model_name,
+                pretrained=pretrained,
+                device=device
+            )
+            self.model.eval()
+            self.dim = self.model.visual.output_dim
+        else:
+            self._load_export(model_name, pretrained)
+        
+        # Cache de embeddings: memória (por caminho, nesta execução) e
+        # disco (por conteúdo da imagem + modelo, entre execuções); os
+        # artefatos quantizados têm cache próprio
+        self.model_key = f"{model_name}-{pretrained}"
+        if backend != "torch":
+            self.model_key += f"-{backend}"
+        self.cache: Dict[str, np.ndarray] = {}
+        self.store = None
+        if CACHE_CONFIG["enabled"] and CACHE_CONFIG["cache_embeddings"]:
+            self.store = EmbeddingStore(CACHE_DIR / "embeddings", model=self.model_key, dim=self.dim)
+    
+    def _load_export(self, model_name: str, pretrained: str):
+        """
+        Carrega a torre de imagem exportada (sempre em CPU).
+        """
+        path = export_dir(model_name, pretrained)
+        info_path = path / "export.json"
+        if not info_path.exists():
+            raise FileNotFoundError(
+                f"Artefato {self.backend} de {model_name} não encontrado em {path}. "
+                f"Rode: python export_clip.py --modelo {model_name} --pretrained {pretrained}"
+            )
+        info = json.loads(info_path.read_text())
+        artifact = info["artifacts"].get(self.backend)
+        if artifact is None:
+            raise FileNotFoundError(f"{path} não tem artefato {self.backend}")
+        if not artifact["parity"]["aprovado"]:
+            logger.warning(
+                f"⚠️  Artefato {self.backend} de {model_name} reprovado na checagem de paridade "
+                f"(cos mínimo {artifact['parity']['cos_min']:.4f})"
+            )
+        
+        self.device = "cpu"
+        self.dim = info["dim"]
+        self.preprocess = open_clip.image_transform(
+            info["image_size"], is_train=False, mean=info["mean"], std=info["std"]
+        )
+        
+        logger.info(f"Carregando {model_name} ({self.backend}: {artifact['file']})...")
+        if self.backend == "onnx":
+            import onnxruntime as ort
+            
+            self.model = None
+            self.session = ort.InferenceSession(
+                str(path / artifact["file"]), providers=["CPUExecutionProvider"]
+            )
+        elif self.backend == "torchscript":
+            self.model = torch.jit.load(str(path / artifact["file"]), map_location="cpu")
+            self.model.eval()
+        else:
+            raise ValueError(f"Backend CLIP desconhecido: {self.backend}")
+    
+    def embed(self, image_paths: List[str | Path], use_cache: bool = True) -> np.ndarray:
+        """
+        Embeddings normalizados de várias imagens (com cache).
+        
+        Imagens fora do cache em memória são procuradas no embedding store
+        pelo hash do conteúdo; as restantes são preprocessadas em paralelo
+        (clip_preprocess_workers threads) e codificadas em lotes de
+        clip_batch_size; o próximo lote é preparado enquanto o atual
+        passa pelo modelo.
+        
+        use_cache=False ignora (e não grava) os caches — usado para medir
+        o custo real de inferência (evaluate_cascade).
+        
+        Returns:
+            Array (n, dim) na ordem de image_paths
+        """
+        keys = [str(p) for p in image_paths]
+        if not keys:
+            return np.empty((0, self.dim), dtype=np.float32)
+        
+        if not use_cache:
+            computed = {}
+            for batch_keys, batch in self._preprocessed_batches(list(dict.fromkeys(keys))):
+                computed.update(zip(batch_keys, self._encode(batch)))
+            return np.stack([computed[k] for k in keys])
+        
+        missing = list(dict.fromkeys(k for k in keys if k not in self.cache))
+        
+        digests = {}
+        if missing and self.store is not None:
+            with ThreadPoolExecutor(max_workers=ML_CONFIG["clip_preprocess_workers"]) as pool:
+                digests = dict(zip(missing, pool.map(file_digest, missing)))
+            
+            stored = self.store.get_many(list(digests.values()))
+            for key in missing:
+                if digests[key] in stored:
+                    self.cache[key] = stored[digests[key]]
+            
+            missing = [k for k in missing if k not in self.cache]
+            if stored:
+                logger.info(f"♻️  {len(stored)} embeddings {self.name} do cache em disco")
+        
+        if missing:
+            start = time.perf_counter()
+            done = 0
+            for batch_keys, batch in self._preprocessed_batches(missing):
+                embs = self._encode(batch)
+                for key, emb in zip(batch_keys, embs):
+                    self.cache[key] = emb
+                if digests:
+                    self.store.put_many([digests[k] for k in batch_keys], embs)
+                done += len(batch_keys)
+            
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"{self.name}: {done} imagens em {elapsed:.1f}s "
+                f"({done / max(elapsed, 1e-9):.1f} img/s, lote {ML_CONFIG['clip_batch_size']})"
+            )
+        
+        return np.stack([self.cache[k] for k in keys])
+    
+    def _encode(self, batch: torch.Tensor) -> np.ndarray:
+        if self.session is not None:
+            embedding = self.session.run(None, {"image": batch.numpy()})[0]
+            return embedding / np.linalg.norm(embedding, axis=-1, keepdims=True)
+        
+        with torch.no_grad():
+            if self.backend == "torchscript":
+                embedding = self.model(batch.to(torch.bfloat16)).float()
+            else:
+                with torch.cuda.amp.autocast(enabled=(self.device == 'cuda')):
+                    embedding = self.model.encode_image(batch.to(self.device))
+            embedding = embedding / embedding.norm(dim=-1, keepdim=True)
+        return embedding.float().cpu().numpy()
+    
+    def _preprocessed_batches(self, keys: List[str]) -> Iterator[Tuple[List[str], torch.Tensor]]:
+        """
+        Lotes (chaves, tensor) preprocessados em threads, com no máximo
+        dois lotes em memória: o que o modelo está usando e o próximo (o
+        seguinte só é submetido depois que o modelo devolve o atual).
+        """
+        batch_size = ML_CONFIG["clip_batch_size"]
+        batches = deque(keys[i:i + batch_size] for i in range(0, len(keys), batch_size))
+        
+        def load(key: str) -> torch.Tensor:
+            return self.preprocess(Image.open(key).convert("RGB"))
+        
+        with ThreadPoolExecutor(max_workers=ML_CONFIG["clip_preprocess_workers"]) as pool:
+            def submit():
+                batch_keys = batches.popleft()
+                return batch_keys, [pool.submit(load, k) for k in batch_keys]
+            
+            pending = deque(submit() for _ in range(min(2, len(batches))))
+            while pending:
+                ready_keys, futures = pending.popleft()
+                yield ready_keys, torch.stack([f.result() for f in futures])
+                if batches:
+                    pending.append(submit())
+
+
 class MatchingAgent:
     """
     Agente responsável por comparação visual multimodal:
-    1. CLIP (ViT-bigG) - similaridade semântica (cores, arquitetura)
+    1. CLIP (ViT-bigG) - similaridade semântica (cores, arquitetura),
+       opcionalmente precedido por uma triagem com um CLIP pequeno (cascata)
     2. SIFT + RANSAC - matching geométrico (pontos de interesse)
     3. Score combinado ponderado
     """
@@ -31,17 +242,26 @@ class MatchingAgent:
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         logger.info(f"Usando device: {self.device}")
         
-        # Carregar modelo CLIP
-        logger.info(f"Carregando {ML_CONFIG['clip_model']}...")
-        self.model, _, self.preprocess = open_clip.create_model_and_transforms(
-            ML_CONFIG["clip_model"],
-            pretrained=ML_CONFIG["clip_pretrained"],
-            device=self.device
+        # Modelo CLIP principal (scores finais)
+        self.encoder = ClipEncoder(
+            ML_CONFIG["clip_model"], ML_CONFIG["clip_pretrained"], self.device,
+            backend=ML_CONFIG["clip_backend"]
         )
-        self.model.eval()
+        self.model = self.encoder.model
+        self.preprocess = self.encoder.preprocess
+        self.model_key = self.encoder.model_key
+        self.embedding_cache = self.encoder.cache
+        
+        # Cascata: modelo pequeno tria todos, o principal só re-pontua o topo
+        self.screener = None
+        if ML_CONFIG["cascade_enabled"]:
+            self.screener = ClipEncoder(
+                ML_CONFIG["screen_model"], ML_CONFIG["screen_pretrained"], self.device,
+                backend=ML_CONFIG["clip_backend"]
+            )
         
-        # Cache de embeddings
-        self.embedding_cache = {}
+        # Índices ANN por região (abertos sob demanda)
+        self.region_indexes: Dict[str, RegionIndex] = {}
         
         logger.info("MatchingAgent inicializado")
     
@@ -49,11 +269,23 @@ class MatchingAgent:
         self,
         query_path: str | Path,
         database_paths: List[str | Path],
-        compute_geometry: bool = True
+        compute_geometry: bool = True,
+        top_k: int = None,
+        min_clip: float = None
     ) -> pd.DataFrame:
         """
         Compara imagem de consulta com banco de imagens.
         
+        Todos os scores CLIP saem de um único produto matricial; o filtro
+        (min_clip) e uma pré-seleção de top_k × geom_pool_factor (por CLIP)
+        são feitos em numpy, só esses passam pelo SIFT, e o top-K final é
+        escolhido pelo score combinado (um match geométrico forte ainda
+        pode ultrapassar imagens com CLIP um pouco maior).
+        
+        Args:
+            top_k: Manter só os K melhores pelo score combinado (padrão: todos)
+            min_clip: Score CLIP mínimo (padrão: sem filtro)
+        
         Returns:
             DataFrame com [db_path, clip_score, geom_score, combined_score]
         """
@@ -61,50 +293,167 @@ class MatchingAgent:
         
         logger.info(f"Comparando {query_path.name} com {len(database_paths)} candidatos")
         
-        # Embedding da query
+        # Cascata: só o topo da triagem passa pelo modelo principal
+        database_paths = self._screen(query_path, database_paths, top_k)
+        
+        # Embeddings em lote (query + banco)
+        start = time.perf_counter()
         query_emb = self._get_embedding(query_path)
+        db_embs = self.embed_images(database_paths)
+        if self.screener is not None:
+            logger.info(
+                f"Cascata [{self.encoder.name}]: {len(database_paths)} imagens "
+                f"em {time.perf_counter() - start:.1f}s"
+            )
         
-        results = []
+        start = time.perf_counter()
+        clip_scores = db_embs @ query_emb
+        pool = top_k * ML_CONFIG["geom_pool_factor"] if top_k and compute_geometry else top_k
+        keep = select_top_k(clip_scores, pool, min_clip)
+        logger.info(
+            f"Scores CLIP: {len(clip_scores)} → {len(keep)} sobreviventes "
+            f"em {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
         
-        for db_path in tqdm(database_paths, desc="Comparando imagens"):
-            db_path = Path(db_path)
-            
-            # CLIP score
-            db_emb = self._get_embedding(db_path)
-            clip_score = float(np.dot(query_emb, db_emb))
-            
-            # Geometria (só se CLIP passar threshold)
-            geom_score = 0.0
-            if compute_geometry and clip_score >= ML_CONFIG["clip_threshold"]:
-                geom_score = self._geometric_match(query_path, db_path)
-            
-            # Score combinado
-            combined_score = (
-                ML_CONFIG["clip_weight"] * clip_score +
-                ML_CONFIG["geom_weight"] * geom_score
-            )
-            
-            results.append({
-                "db_path": str(db_path),
-                "db_filename": db_path.name,
-                "clip_score": clip_score,
-                "geom_score": geom_score,
-                "combined_score": combined_score
-            })
+        db_paths = [Path(database_paths[i]) for i in keep]
+        clip_kept = clip_scores[keep].astype(np.float64)
         
-        df = pd.DataFrame(results)
-        df = df.sort_values("combined_score", ascending=False).reset_index(drop=True)
+        # Geometria (só se CLIP passar threshold)
+        geom_scores = np.zeros(len(keep))
+        if compute_geometry:
+            for j in tqdm(
+                np.flatnonzero(clip_kept >= ML_CONFIG["clip_threshold"]),
+                desc="Geometria (SIFT)"
+            ):
+                geom_scores[j] = self._geometric_match(query_path, db_paths[j])
         
-        logger.info(f"Top match: {df.iloc[0]['db_filename']} (score: {df.iloc[0]['combined_score']:.3f})")
+        combined = ML_CONFIG["clip_weight"] * clip_kept + ML_CONFIG["geom_weight"] * geom_scores
+        best = select_top_k(combined, top_k)
+        
+        df = pd.DataFrame({
+            "db_path": [str(db_paths[j]) for j in best],
+            "db_filename": [db_paths[j].name for j in best],
+            "clip_score": clip_kept[best],
+            "geom_score": geom_scores[best],
+            "combined_score": combined[best]
+        })
+        
+        if len(df) > 0:
+            logger.info(f"Top match: {df.iloc[0]['db_filename']} (score: {df.iloc[0]['combined_score']:.3f})")
         
         return df
     
+    def _screen(
+        self,
+        query_path: Path,
+        database_paths: List[str | Path],
+        top_k: int = None
+    ) -> List[str | Path]:
+        """
+        Primeiro estágio da cascata: o modelo pequeno pontua todas as
+        imagens e só a fração screen_keep_fraction (no mínimo
+        screen_min_keep e top_k) segue para o modelo principal.
+        """
+        n = len(database_paths)
+        keep = max(
+            int(np.ceil(ML_CONFIG["screen_keep_fraction"] * n)),
+            ML_CONFIG["screen_min_keep"],
+            top_k or 0
+        )
+        if self.screener is None or n <= keep:
+            return database_paths
+        
+        start = time.perf_counter()
+        query_emb = self.screener.embed([query_path])[0]
+        scores = self.screener.embed(database_paths) @ query_emb
+        survivors = select_top_k(scores, keep)
+        elapsed = time.perf_counter() - start
+        
+        logger.info(
+            f"Cascata [{self.screener.name}]: {n} → {len(survivors)} imagens "
+            f"em {elapsed:.1f}s ({n / max(elapsed, 1e-9):.1f} img/s)"
+        )
+        return [database_paths[i] for i in survivors]
+    
+    def evaluate_cascade(
+        self,
+        query_path: str | Path,
+        database_paths: List[str | Path],
+        fractions: Tuple[float, ...] = (0.05, 0.1, 0.2, 0.3, 0.5),
+        k: int = None
+    ) -> pd.DataFrame:
+        """
+        Relatório recall × velocidade da cascata para uma consulta.
+        
+        Roda os dois modelos em todas as imagens (sem cache, para medir o
+        custo real) e, para cada fração mantida pela triagem, mede quantos
+        dos top-K do modelo principal sobreviveriam (recall@K) e o tempo
+        estimado da cascata (triagem em tudo + principal na fração).
+        
+        Returns:
+            DataFrame com [estagio, fracao, imagens_principal, recall_at_k,
+            tempo_s, img_s, speedup]
+        """
+        if self.screener is None:
+            raise ValueError("Cascata desligada (ML_CONFIG['cascade_enabled'] = False)")
+        
+        k = k or ML_CONFIG["top_k_candidates"]
+        n = len(database_paths)
+        
+        start = time.perf_counter()
+        screen_scores = (
+            self.screener.embed(database_paths, use_cache=False)
+            @ self.screener.embed([query_path], use_cache=False)[0]
+        )
+        t_screen = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        full_scores = (
+            self.encoder.embed(database_paths, use_cache=False)
+            @ self.encoder.embed([query_path], use_cache=False)[0]
+        )
+        t_full = time.perf_counter() - start
+        
+        reference = set(select_top_k(full_scores, k).tolist())
+        rows = [{
+            "estagio": f"{self.screener.name} (só triagem)",
+            "fracao": 0.0,
+            "imagens_principal": 0,
+            "recall_at_k": len(reference & set(select_top_k(screen_scores, k).tolist())) / len(reference),
+            "tempo_s": t_screen
+        }]
+        for fraction in fractions:
+            keep = select_top_k(screen_scores, max(int(np.ceil(fraction * n)), k))
+            rows.append({
+                "estagio": f"{self.screener.name} → {self.encoder.name}",
+                "fracao": fraction,
+                "imagens_principal": len(keep),
+                "recall_at_k": len(reference & set(keep.tolist())) / len(reference),
+                "tempo_s": t_screen + t_full * len(keep) / n
+            })
+        rows.append({
+            "estagio": f"{self.encoder.name} (só principal)",
+            "fracao": 1.0,
+            "imagens_principal": n,
+            "recall_at_k": 1.0,
+            "tempo_s": t_full
+        })
+        
+        report = pd.DataFrame(rows)
+        report["img_s"] = n / report["tempo_s"].clip(lower=1e-9)
+        report["speedup"] = t_full / report["tempo_s"].clip(lower=1e-9)
+        
+        logger.info(f"Cascata ({n} imagens, recall@{k}):\n{report.to_string(index=False)}")
+        return report
+    
     def rank_candidates(
         self,
         query_path: str | Path,
         sv_metadata: pd.DataFrame,
         sv_dir: Path,
-        top_k: int = None
+        top_k: int = None,
+        min_clip: float = None,
+        compute_geometry: bool = True
     ) -> pd.DataFrame:
         """
         Ranqueia candidatos do Street View.
@@ -112,58 +461,137 @@ class MatchingAgent:
         Args:
             query_path: Foto do usuário
             sv_metadata: DataFrame com metadados dos SVs (filename, lat, lon, etc)
-            sv_dir: Diretório com imagens SV
+            sv_dir: Raiz do image store com as imagens SV
             top_k: Retornar apenas top K
+            min_clip: Score CLIP mínimo (padrão: clip_threshold)
+            compute_geometry: Rodar SIFT/RANSAC (False na triagem em
+                miniatura; ver score_geometry)
             
         Returns:
             DataFrame com candidatos ranqueados + scores
         """
         top_k = top_k or ML_CONFIG["top_k_candidates"]
+        min_clip = ML_CONFIG["clip_threshold"] if min_clip is None else min_clip
+        
+        # Caminhos das imagens SV (resolvidos pelo image store)
+        store = StreetViewImageStore(sv_dir)
+        path_to_filename = {
+            str(store.resolve(fn)): fn for fn in sv_metadata["filename"]
+        }
+        sv_paths = list(path_to_filename)
+        
+        # Comparar (threshold e top K aplicados sobre o vetor de scores)
+        scores_df = self.compare_images(
+            query_path, sv_paths,
+            compute_geometry=compute_geometry,
+            top_k=top_k,
+            min_clip=min_clip
+        )
         
-        # Caminhos das imagens SV
-        sv_paths = [sv_dir / fn for fn in sv_metadata["filename"]]
-        
-        # Comparar
-        scores_df = self.compare_images(query_path, sv_paths)
-        
-        # Merge com metadados
-        scores_df["filename"] = scores_df["db_filename"]
+        # Merge com metadados (só dos sobreviventes)
+        scores_df["filename"] = scores_df["db_path"].map(path_to_filename)
         merged = scores_df.merge(sv_metadata, on="filename", how="left")
         
-        # Filtrar por threshold
-        merged = merged[merged["clip_score"] >= ML_CONFIG["clip_threshold"]]
-        
-        # Top K
-        merged = merged.head(top_k)
-        
         logger.info(f"Candidatos acima de threshold: {len(merged)}")
         
         return merged
     
-    def _get_embedding(self, image_path: Path) -> np.ndarray:
+    def region_index(self, region: str) -> RegionIndex:
         """
-        Obtém embedding CLIP (com cache).
+        Índice ANN da região para o modelo atual (criado se não existir).
         """
-        cache_key = str(image_path)
-        
-        if cache_key in self.embedding_cache:
-            return self.embedding_cache[cache_key]
-        
-        # Carregar e preprocessar
-        img = Image.open(image_path).convert("RGB")
-        img_tensor = self.preprocess(img).unsqueeze(0).to(self.device)
-        
-        # Inferência
-        with torch.no_grad(), torch.cuda.amp.autocast(enabled=(self.device == 'cuda')):
-            embedding = self.model.encode_image(img_tensor)
-            embedding = embedding / embedding.norm(dim=-1, keepdim=True)
+        if region not in self.region_indexes:
+            self.region_indexes[region] = RegionIndex(
+                ML_CONFIG["ann_dir"],
+                region,
+                model=self.model_key,
+                dim=self.encoder.dim,
+                nprobe=ML_CONFIG["ann_nprobe"],
+                min_train=ML_CONFIG["ann_min_train"]
+            )
+        return self.region_indexes[region]
+    
+    def index_region(self, region: str, sv_metadata: pd.DataFrame, sv_dir: Path) -> int:
+        """
+        Insere no índice da região as imagens de sv_metadata (embeddings
+        do cache/store quando já calculados).
         
-        emb_np = embedding.squeeze(0).detach().cpu().numpy()
+        Returns:
+            Número de imagens novas no índice
+        """
+        if len(sv_metadata) == 0:
+            return 0
+        store = StreetViewImageStore(sv_dir)
+        embs = self.embed_images([store.resolve(fn) for fn in sv_metadata["filename"]])
+        return self.region_index(region).add(sv_metadata, embs)
+    
+    def search_region(
+        self,
+        query_path: str | Path,
+        region: str,
+        top_k: int = None
+    ) -> pd.DataFrame:
+        """
+        Top-K fachadas da região direto do índice ANN: só a query passa
+        pelo CLIP, sem downloads nem inferência por imagem.
         
-        # Cachear
-        self.embedding_cache[cache_key] = emb_np
+        Returns:
+            DataFrame com [filename, pano_id, lat, lon, heading, clip_score,
+            geom_score, combined_score] (geometria: ver score_geometry)
+        """
+        top_k = top_k or ML_CONFIG["top_k_candidates"]
+        index = self.region_index(region)
+        query_emb = self._get_embedding(Path(query_path))
+        
+        start = time.perf_counter()
+        result = index.search(query_emb, top_k)
+        logger.info(
+            f"Índice '{region}': top {len(result)} de {len(index)} imagens "
+            f"em {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
         
-        return emb_np
+        result["geom_score"] = 0.0
+        result["combined_score"] = ML_CONFIG["clip_weight"] * result["clip_score"]
+        return result
+    
+    def score_geometry(
+        self,
+        query_path: str | Path,
+        ranked: pd.DataFrame,
+        sv_dir: Path
+    ) -> pd.DataFrame:
+        """
+        SIFT/RANSAC sobre candidatos já triados pelo CLIP (imagens em
+        resolução cheia, coluna "filename"), recalculando o score combinado.
+        """
+        store = StreetViewImageStore(sv_dir)
+        ranked = ranked.copy()
+        
+        geom = []
+        for fn, clip_score in zip(ranked["filename"], ranked["clip_score"]):
+            if clip_score >= ML_CONFIG["clip_threshold"]:
+                geom.append(self._geometric_match(Path(query_path), store.resolve(fn)))
+            else:
+                geom.append(0.0)
+        
+        ranked["geom_score"] = geom
+        ranked["combined_score"] = (
+            ML_CONFIG["clip_weight"] * ranked["clip_score"] +
+            ML_CONFIG["geom_weight"] * ranked["geom_score"]
+        )
+        return ranked.sort_values("combined_score", ascending=False).reset_index(drop=True)
+    
+    def embed_images(self, image_paths: List[str | Path]) -> np.ndarray:
+        """
+        Embeddings normalizados do modelo principal (ver ClipEncoder.embed).
+        """
+        return self.encoder.embed(image_paths)
+    
+    def _get_embedding(self, image_path: Path) -> np.ndarray:
+        """
+        Obtém embedding CLIP de uma imagem (com cache).
+        """
+        return self.embed_images([image_path])[0]
     
     def _geometric_match(self, img1_path: Path, img2_path: Path) -> float:
         """
@@ -0,0 +1,208 @@
+"""
+Índice espacial local de panoramas Street View conhecidos
+Guarda tudo o que já foi aprendido da Metadata API (panos encontrados e
+pontos sem cobertura) e responde consultas por raio sem ir à rede.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+
+from .geo_utils import deg_per_m, haversine_m, METERS_PER_DEG_LAT
+
+
+class PanoIndex:
+    """
+    Persistência em SQLite + hash espacial em memória (células fixas).
+
+    - panos: pano_id → (lat, lon, date) da localização "snapped"
+    - probes: pontos consultados → status da resposta (inclui ZERO_RESULTS)
+
+    Consultas por raio visitam só as células vizinhas, então custam
+    microssegundos mesmo com milhões de panos.
+
+    Toda entrada (pano, consulta OK ou sem cobertura) expira após ttl_days
+    contados do updated_at: depois disso lookup() devolve None e o ponto
+    volta ao cache/API, para descobrir imagens mais novas.
+    """
+
+    def __init__(self, path: Path, cell_m: float = 100, ttl_days: float = 30):
+        self.path = Path(path)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.cell_deg = cell_m / METERS_PER_DEG_LAT
+        self.ttl_seconds = ttl_days * 86400
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS panos ("
+            "pano_id TEXT PRIMARY KEY, lat REAL, lon REAL, date TEXT, updated_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            "lat REAL, lon REAL, status TEXT, pano_id TEXT, updated_at REAL, "
+            "PRIMARY KEY (lat, lon))"
+        )
+        self._conn.commit()
+
+        # Hash espacial: célula → lista de ids internos
+        self._panos: List[Dict] = []
+        self._pano_pos: Dict[str, int] = {}
+        self._pano_cells = defaultdict(list)
+        self._probes: List[Dict] = []
+        self._probe_cells = defaultdict(list)
+
+        for pano_id, lat, lon, date, updated_at in self._conn.execute("SELECT * FROM panos"):
+            self._add_pano_mem(pano_id, lat, lon, date, updated_at)
+        for lat, lon, status, pano_id, updated_at in self._conn.execute("SELECT * FROM probes"):
+            self._add_probe_mem(lat, lon, status, pano_id, updated_at)
+
+        self.hits = 0
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def add_probe(self, lat: float, lon: float, meta: Dict):
+        """
+        Registra o resultado de uma consulta à Metadata API.
+        """
+        status = meta.get("status")
+        if status not in ("OK", "ZERO_RESULTS", "NOT_FOUND"):
+            return  # erros/cota são transitórios
+
+        pano_id = meta.get("pano_id") if status == "OK" else None
+        now = time.time()
+
+        with self._lock:
+            if pano_id:
+                loc = meta.get("location", {})
+                p_lat, p_lon = loc.get("lat", lat), loc.get("lng", lon)
+                date = meta.get("date", "")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO panos VALUES (?, ?, ?, ?, ?)",
+                    (pano_id, p_lat, p_lon, date, now)
+                )
+                if pano_id in self._pano_pos:
+                    self._panos[self._pano_pos[pano_id]].update(date=date, updated_at=now)
+                else:
+                    self._add_pano_mem(pano_id, p_lat, p_lon, date, now)
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?)",
+                (lat, lon, status, pano_id, now)
+            )
+            self._conn.commit()
+            self._add_probe_mem(lat, lon, status, pano_id, now)
+
+    def _cell(self, lat: float, lon: float):
+        return int(np.floor(lat / self.cell_deg)), int(np.floor(lon / self.cell_deg))
+
+    def _add_pano_mem(self, pano_id, lat, lon, date, updated_at):
+        self._pano_pos[pano_id] = len(self._panos)
+        self._pano_cells[self._cell(lat, lon)].append(len(self._panos))
+        self._panos.append({
+            "pano_id": pano_id, "lat": lat, "lon": lon, "date": date,
+            "updated_at": updated_at or 0
+        })
+
+    def _add_probe_mem(self, lat, lon, status, pano_id, updated_at):
+        self._probe_cells[self._cell(lat, lon)].append(len(self._probes))
+        self._probes.append({
+            "lat": lat, "lon": lon, "status": status,
+            "pano_id": pano_id, "updated_at": updated_at
+        })
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def _near(self, items: List[Dict], cells, lat: float, lon: float, radius_m: float) -> List[Dict]:
+        """
+        Itens a até radius_m de (lat, lon), ordenados por distância.
+        """
+        dlat, dlon = deg_per_m(lat)
+        r0, c0 = self._cell(lat - radius_m * dlat, lon - radius_m * dlon)
+        r1, c1 = self._cell(lat + radius_m * dlat, lon + radius_m * dlon)
+
+        with self._lock:
+            idx = [
+                i
+                for r in range(r0, r1 + 1)
+                for c in range(c0, c1 + 1)
+                for i in cells.get((r, c), ())
+            ]
+            found = [items[i] for i in idx]
+
+        if not found:
+            return []
+
+        dist = haversine_m(
+            lat, lon,
+            np.array([f["lat"] for f in found]),
+            np.array([f["lon"] for f in found])
+        )
+        order = np.argsort(dist)
+        return [dict(found[i], dist_m=float(dist[i])) for i in order if dist[i] <= radius_m]
+
+    def panos_within(self, lat: float, lon: float, radius_m: float) -> List[Dict]:
+        """
+        Panoramas conhecidos a até radius_m de (lat, lon).
+        """
+        return self._near(self._panos, self._pano_cells, lat, lon, radius_m)
+
+    def lookup(self, lat: float, lon: float, tolerance_m: float) -> Optional[Dict]:
+        """
+        Resposta local equivalente à Metadata API para o ponto, se o índice
+        cobre a vizinhança:
+        - ponto já consultado a até tolerance_m → mesma resposta
+        - pano conhecido a até tolerance_m → status OK com esse pano
+        Entradas mais antigas que ttl_days são ignoradas.
+
+        Returns:
+            Dict no formato da Metadata API, ou None se a área é desconhecida
+            (ou se o que se sabe dela expirou)
+        """
+        for probe in self._near(self._probes, self._probe_cells, lat, lon, tolerance_m):
+            if not self._fresh(probe):
+                continue
+            if probe["status"] != "OK":
+                return self._hit(None, status=probe["status"])
+            pos = self._pano_pos.get(probe["pano_id"])
+            if pos is not None and self._fresh(self._panos[pos]):
+                return self._hit(self._panos[pos])
+
+        for pano in self.panos_within(lat, lon, tolerance_m):
+            if self._fresh(pano):
+                return self._hit(pano)
+
+        return None
+
+    def _fresh(self, entry: Dict) -> bool:
+        return time.time() - entry["updated_at"] <= self.ttl_seconds
+
+    def _hit(self, pano: Optional[Dict], status: str = "OK") -> Dict:
+        with self._lock:
+            self.hits += 1
+
+        if pano is None:
+            return {"status": status}
+
+        return {
+            "status": "OK",
+            "pano_id": pano["pano_id"],
+            "date": pano["date"],
+            "location": {"lat": pano["lat"], "lng": pano["lon"]}
+        }
+
+    def __len__(self):
+        return len(self._panos)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
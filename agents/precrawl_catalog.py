@@ -0,0 +1,219 @@
+"""
+Catálogo de bairros pré-varridos (gerado por precrawl.py)
+Panos, headings e, opcionalmente, embeddings CLIP de áreas varridas com
+antecedência, em tiles fixos: o SearchAgent serve áreas cobertas direto
+do catálogo, sem varrer a grade na Metadata API.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .geo_utils import deg_per_m, haversine_m, METERS_PER_DEG_LAT
+
+logger = logging.getLogger(__name__)
+
+TILE_COLUMNS = ["pano_id", "lat", "lon", "date", "headings"]
+
+
+class PrecrawlCatalog:
+    """
+    Layout em disco:
+        <root>/tiles/<tile_id>.csv   um pano por linha (pano_id, lat, lon, date, headings)
+        <root>/tiles/<tile_id>.npz   embeddings CLIP opcionais (filenames, emb, model)
+        <root>/tiles/<tile_id>.done  marcador de tile concluído (resumo em JSON)
+
+    Os tiles formam uma grade global de tile_m metros (em graus de latitude),
+    então os ids são estáveis entre execuções, áreas e workers.
+    """
+
+    def __init__(self, root: Path, tile_m: float = 500):
+        self.root = Path(root)
+        self.tiles_dir = self.root / "tiles"
+        self.tiles_dir.mkdir(exist_ok=True, parents=True)
+        self.tile_deg = tile_m / METERS_PER_DEG_LAT
+
+        self._lock = threading.Lock()
+        self._tiles: Dict[str, pd.DataFrame] = {}
+
+    # ------------------------------------------------------------------
+    # Geometria dos tiles
+    # ------------------------------------------------------------------
+
+    def tile_id(self, lat: float, lon: float) -> str:
+        return f"{int(np.floor(lat / self.tile_deg))}_{int(np.floor(lon / self.tile_deg))}"
+
+    def tile_bounds(self, tile_id: str) -> Tuple[float, float, float, float]:
+        """
+        (lat_min, lon_min, lat_max, lon_max) do tile.
+        """
+        row, col = (int(v) for v in tile_id.split("_"))
+        return (
+            row * self.tile_deg, col * self.tile_deg,
+            (row + 1) * self.tile_deg, (col + 1) * self.tile_deg
+        )
+
+    def tiles_in_bbox(
+        self,
+        lat_min: float,
+        lon_min: float,
+        lat_max: float,
+        lon_max: float
+    ) -> List[str]:
+        r0, c0 = (int(v) for v in self.tile_id(lat_min, lon_min).split("_"))
+        r1, c1 = (int(v) for v in self.tile_id(lat_max, lon_max).split("_"))
+        return [f"{r}_{c}" for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+    def tiles_for_disk(self, lat: float, lon: float, radius_m: float) -> List[str]:
+        dlat, dlon = deg_per_m(lat)
+        return self.tiles_in_bbox(
+            lat - radius_m * dlat, lon - radius_m * dlon,
+            lat + radius_m * dlat, lon + radius_m * dlon
+        )
+
+    # ------------------------------------------------------------------
+    # Escrita (precrawl.py)
+    # ------------------------------------------------------------------
+
+    def is_done(self, tile_id: str) -> bool:
+        return (self.tiles_dir / f"{tile_id}.done").exists()
+
+    def write_tile(
+        self,
+        tile_id: str,
+        candidates: List[Dict],
+        embeddings: Optional[Dict[str, np.ndarray]] = None,
+        model: str = None
+    ):
+        """
+        Grava os panos de um tile e, por último, o marcador .done
+        (um tile interrompido no meio é refeito na próxima execução).
+        """
+        rows = [{
+            "pano_id": c["sv_pano_id"],
+            "lat": c["sv_lat"],
+            "lon": c["sv_lon"],
+            "date": c.get("sv_date", ""),
+            "headings": ";".join(str(int(h)) for h in c.get("headings") or [])
+        } for c in candidates if c.get("sv_pano_id")]
+
+        csv_path = self.tiles_dir / f"{tile_id}.csv"
+        tmp = csv_path.with_suffix(".csv.part")
+        pd.DataFrame(rows, columns=TILE_COLUMNS).to_csv(tmp, index=False)
+        os.replace(tmp, csv_path)
+
+        if embeddings:
+            npz_path = self.tiles_dir / f"{tile_id}.npz"
+            tmp = self.tiles_dir / f"{tile_id}.part.npz"
+            np.savez(
+                tmp,
+                filenames=np.array(list(embeddings)),
+                emb=np.stack(list(embeddings.values())).astype(np.float32),
+                model=np.array(model or "")
+            )
+            os.replace(tmp, npz_path)
+
+        summary = {"panos": len(rows), "embeddings": len(embeddings or {})}
+        (self.tiles_dir / f"{tile_id}.done").write_text(json.dumps(summary))
+
+    # ------------------------------------------------------------------
+    # Leitura (SearchAgent / GeoLocalizador)
+    # ------------------------------------------------------------------
+
+    def done_tiles(self, lat: float, lon: float, radius_m: float) -> List[str]:
+        """
+        Tiles já varridos entre os que tocam o círculo (cobertura parcial).
+        """
+        return [t for t in self.tiles_for_disk(lat, lon, radius_m) if self.is_done(t)]
+
+    def in_tiles(self, lats: np.ndarray, lons: np.ndarray, tile_ids: List[str]) -> np.ndarray:
+        """
+        Máscara dos pontos que caem em algum dos tiles indicados.
+        """
+        if not tile_ids:
+            return np.zeros(len(lats), dtype=bool)
+        # (linha, coluna) codificadas num único int64 para o np.isin
+        wanted = np.array([[int(v) for v in t.split("_")] for t in tile_ids], dtype=np.int64)
+        rows = np.floor(np.asarray(lats) / self.tile_deg).astype(np.int64)
+        cols = np.floor(np.asarray(lons) / self.tile_deg).astype(np.int64)
+        return np.isin((rows << 32) + cols, (wanted[:, 0] << 32) + wanted[:, 1])
+
+    def candidates(
+        self,
+        center_lat: float,
+        center_lon: float,
+        radius_m: float,
+        inner_radius_m: float = 0,
+        tile_ids: List[str] = None
+    ) -> List[Dict]:
+        """
+        Candidatos no formato do SearchAgent (já com Street View e headings)
+        para os panos do catálogo dentro do círculo/anel, só dos tiles
+        indicados (padrão: todos os que tocam o círculo).
+        """
+        tiles = tile_ids if tile_ids is not None else self.tiles_for_disk(center_lat, center_lon, radius_m)
+        frames = [f for f in map(self._load_tile, tiles) if len(f)]
+        if not frames:
+            return []
+
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset="pano_id")
+        dist = haversine_m(center_lat, center_lon, df["lat"].to_numpy(), df["lon"].to_numpy())
+        df = df[(dist <= radius_m) & ((dist > inner_radius_m) | (inner_radius_m <= 0))]
+
+        return [{
+            "lat": row.lat,
+            "lon": row.lon,
+            "source": "precrawl",
+            "type": "precrawl_pano",
+            "sv_available": True,
+            "sv_date": row.date if isinstance(row.date, str) else "",
+            "sv_pano_id": row.pano_id,
+            "sv_lat": row.lat,
+            "sv_lon": row.lon,
+            "headings": [int(h) for h in str(row.headings).split(";") if h.strip().isdigit()]
+        } for row in df.itertuples()]
+
+    def embeddings(
+        self,
+        filenames: List[str],
+        model: str,
+        tile_ids: List[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Embeddings pré-calculados (filename → vetor) do modelo pedido,
+        procurando só nos tiles indicados (padrão: todos).
+        """
+        if tile_ids is None:
+            paths = sorted(self.tiles_dir.glob("*.npz"))
+        else:
+            paths = [self.tiles_dir / f"{t}.npz" for t in tile_ids]
+
+        wanted = set(filenames)
+        found = {}
+        for npz_path in paths:
+            if not wanted - found.keys():
+                break
+            if not npz_path.exists():
+                continue
+            with np.load(npz_path) as data:
+                if str(data["model"]) != model:
+                    continue
+                for fn, emb in zip(data["filenames"].tolist(), data["emb"]):
+                    if fn in wanted:
+                        found[fn] = emb
+        return found
+
+    def _load_tile(self, tile_id: str) -> pd.DataFrame:
+        with self._lock:
+            if tile_id not in self._tiles:
+                path = self.tiles_dir / f"{tile_id}.csv"
+                self._tiles[tile_id] = (
+                    pd.read_csv(path, dtype={"pano_id": str, "date": str, "headings": str})
+                    if path.exists() else pd.DataFrame(columns=TILE_COLUMNS)
+                )
+            return self._tiles[tile_id]
@@ -0,0 +1,86 @@
+"""
+Limitador de taxa (token bucket) compartilhado entre threads
+Com backoff adaptativo (AIMD) quando a API sinaliza excesso de cota
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe.
+
+    - `acquire()` bloqueia até haver um token disponível
+    - `backoff()` reduz a taxa pela metade e pausa o bucket (429 / OVER_QUERY_LIMIT)
+    - `recover()` aumenta a taxa gradualmente de volta ao máximo após sucessos
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = None,
+        min_rate: float = 1.0,
+        recover_step: float = None
+    ):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.recover_step = recover_step or max(0.1, self.max_rate / 50)
+
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        self.backoffs = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        self._last = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def acquire(self):
+        """
+        Consome um token, esperando o necessário.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+    def backoff(self, pause_s: float = 1.0):
+        """
+        Sinaliza excesso de cota: taxa cai pela metade e o bucket pausa.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.backoffs += 1
+
+            # Vários 429 simultâneos contam como um único evento de congestionamento
+            if now < self._paused_until:
+                return
+
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            self._paused_until = now + pause_s
+
+    def recover(self):
+        """
+        Sinaliza sucesso: taxa sobe aditivamente até o máximo.
+        """
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recover_step)
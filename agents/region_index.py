@@ -0,0 +1,251 @@
+"""
+Índice ANN (IVF) de embeddings CLIP por região
+Para áreas consultadas repetidamente (bairros pré-varridos): a foto do
+usuário é comparada com todas as fachadas da região sem downloads e sem
+inferência por imagem — só a query passa pelo CLIP, e a busca visita as
+listas invertidas mais próximas em vez de todos os vetores.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ITEM_COLUMNS = ["filename", "pano_id", "lat", "lon", "heading"]
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name.strip().lower())
+
+
+def spherical_kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Centróides (k, dim) normalizados de vetores unitários (similaridade
+    por produto interno, como o CLIP).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = ~sums.any(axis=1)
+        sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+    return centroids
+
+
+class RegionIndex:
+    """
+    Layout em disco (um diretório por região e modelo):
+        <root>/<região>/<modelo>/vectors.f32     vetores (n, dim) float32, append-only
+        <root>/<região>/<modelo>/lists.i32       lista invertida de cada vetor
+        <root>/<região>/<modelo>/items.csv       filename, pano_id, lat, lon, heading
+        <root>/<região>/<modelo>/centroids.npy   centróides do IVF
+        <root>/<região>/<modelo>/meta.json       dim, n do último treino
+
+    Inserções são incrementais (o vetor entra na lista do centróide mais
+    próximo); quando a região dobra de tamanho desde o último treino, os
+    centróides são re-treinados. Abaixo de min_train vetores a busca é
+    exata (força bruta). Escritas de vários processos (shards do
+    precrawl.py) são serializadas por um lock de arquivo.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        region: str,
+        model: str,
+        dim: int,
+        nprobe: int = 8,
+        min_train: int = 1024
+    ):
+        self.dir = Path(root) / _slug(region) / _slug(model)
+        self.dir.mkdir(exist_ok=True, parents=True)
+        self.region = region
+        self.dim = dim
+        self.nprobe = nprobe
+        self.min_train = min_train
+
+        self._lock = threading.Lock()
+        self._items_size = -1
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock, open(self.dir / ".lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        """
+        (Re)carrega o índice do disco; vetores sem item (escrita
+        interrompida ou em andamento) são ignorados.
+        """
+        items_path = self.dir / "items.csv"
+        self._items_size = items_path.stat().st_size if items_path.exists() else 0
+        self.items = (
+            pd.read_csv(items_path, dtype={"filename": str, "pano_id": str})
+            if self._items_size else pd.DataFrame(columns=ITEM_COLUMNS)
+        )
+        n = len(self.items)
+
+        self.vectors = (
+            np.memmap(self.dir / "vectors.f32", dtype=np.float32, mode="r", shape=(n, self.dim))
+            if n else np.empty((0, self.dim), dtype=np.float32)
+        )
+        lists_path = self.dir / "lists.i32"
+        self.lists = (
+            np.fromfile(lists_path, dtype=np.int32)[:n]
+            if lists_path.exists() else np.empty(0, dtype=np.int32)
+        )
+        self._filenames = set(self.items["filename"])
+
+        meta_path = self.dir / "meta.json"
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        self.trained_n = meta.get("trained_n", 0)
+        self.centroids = np.load(self.dir / "centroids.npy") if self.trained_n else None
+        self._build_lists()
+
+    def _build_lists(self):
+        """
+        Listas invertidas em memória: ids ordenados por lista + offsets.
+        """
+        if self.centroids is None:
+            self._order = self._offsets = None
+            return
+        self._order = np.argsort(self.lists, kind="stable")
+        self._offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.lists, minlength=len(self.centroids)))]
+        )
+
+    def _sync(self):
+        """
+        Recarrega se outro processo inseriu vetores desde a última leitura.
+        """
+        items_path = self.dir / "items.csv"
+        size = items_path.stat().st_size if items_path.exists() else 0
+        if size != self._items_size:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def add(self, items: pd.DataFrame, embeddings: np.ndarray) -> int:
+        """
+        Insere imagens novas (filenames já indexados são ignorados).
+
+        Returns:
+            Número de vetores inseridos
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+
+        with self._file_lock():
+            self._sync()
+
+            keep = ~items["filename"].isin(self._filenames).to_numpy()
+            keep &= ~items["filename"].duplicated().to_numpy()
+            if not keep.any():
+                return 0
+            new_items = items.loc[keep, ITEM_COLUMNS]
+            new_embs = embeddings[keep]
+
+            lists = (
+                np.argmax(new_embs @ self.centroids.T, axis=1).astype(np.int32)
+                if self.centroids is not None else np.zeros(len(new_embs), dtype=np.int32)
+            )
+
+            # Descarta restos de uma escrita interrompida; vetores e listas
+            # vão antes do item, que é o "commit" da linha
+            n = len(self.items)
+            for name, itemsize in (("vectors.f32", self.dim * 4), ("lists.i32", 4)):
+                with open(self.dir / name, "a+b") as f:
+                    f.truncate(n * itemsize)
+
+            with open(self.dir / "vectors.f32", "ab") as f:
+                new_embs.tofile(f)
+            with open(self.dir / "lists.i32", "ab") as f:
+                lists.tofile(f)
+            items_path = self.dir / "items.csv"
+            new_items.to_csv(items_path, mode="a", header=not self._items_size, index=False)
+
+            self._load()
+            n = len(self.items)
+            if n >= self.min_train and n >= 2 * self.trained_n:
+                self._train()
+
+        return int(keep.sum())
+
+    def _train(self):
+        """
+        Re-treina os centróides (k ≈ √n) e reatribui todos os vetores.
+        """
+        n = len(self.items)
+        k = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample = np.asarray(self.vectors[np.sort(rng.choice(n, size=min(n, 64 * k), replace=False))])
+        centroids = spherical_kmeans(sample, k).astype(np.float32)
+
+        lists = np.empty(n, dtype=np.int32)
+        for i in range(0, n, 65536):
+            lists[i:i + 65536] = np.argmax(np.asarray(self.vectors[i:i + 65536]) @ centroids.T, axis=1)
+
+        tmp = self.dir / "lists.i32.part"
+        lists.tofile(tmp)
+        np.save(self.dir / "centroids.part.npy", centroids)
+        os.replace(self.dir / "centroids.part.npy", self.dir / "centroids.npy")
+        os.replace(tmp, self.dir / "lists.i32")
+        (self.dir / "meta.json").write_text(json.dumps({"dim": self.dim, "trained_n": n}))
+
+        self.centroids, self.lists, self.trained_n = centroids, lists, n
+        self._build_lists()
+        logger.info(f"Índice '{self.region}': {k} listas treinadas com {n} vetores")
+
+    # ------------------------------------------------------------------
+    # Busca
+    # ------------------------------------------------------------------
+
+    def search(self, query_emb: np.ndarray, top_k: int) -> pd.DataFrame:
+        """
+        Top-K imagens da região mais parecidas com a query (coluna
+        clip_score), visitando as nprobe listas mais próximas.
+        """
+        with self._lock:
+            self._sync()
+            if self.centroids is None:
+                rows = np.arange(len(self.items))
+            else:
+                probe = np.argsort(-(self.centroids @ query_emb))[:self.nprobe]
+                rows = np.sort(np.concatenate(
+                    [self._order[self._offsets[c]:self._offsets[c + 1]] for c in probe]
+                ))
+            scores = np.asarray(self.vectors[rows]) @ query_emb
+
+        best = (
+            np.argpartition(-scores, top_k - 1)[:top_k]
+            if len(scores) > top_k else np.arange(len(scores))
+        )
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        result = self.items.iloc[rows[best]].reset_index(drop=True)
+        result["clip_score"] = scores[best].astype(np.float64)
+        return result
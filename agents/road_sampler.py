@@ -0,0 +1,192 @@
+"""
+Amostragem de candidatos ao longo das ruas (extrato OSM local)
+Em vez de uma grade cega (que cai em quadras, parques e lotes), coloca
+pontos sobre os segmentos de rua a um espaçamento fixo.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+
+from .geo_utils import deg_per_m
+
+logger = logging.getLogger(__name__)
+
+
+class RoadSampler:
+    """
+    Carrega vias de um extrato OSM em disco:
+    - GeoJSON (LineString / MultiLineString com propriedade "highway")
+    - PBF (requer o pacote opcional `osmium`)
+
+    e amostra pontos ao longo delas dentro de um raio.
+    """
+
+    def __init__(self, path: Path, highway_types: List[str]):
+        self.path = Path(path)
+        self.highway_types = set(highway_types)
+
+        if self.path.suffix.lower() == ".pbf":
+            ways = self._load_pbf()
+        else:
+            ways = self._load_geojson()
+
+        # Cada via: array (n, 2) de [lat, lon]; bbox por via para filtro rápido
+        self.ways = [w for w in ways if len(w) >= 2]
+        if self.ways:
+            self.bboxes = np.array([
+                [w[:, 0].min(), w[:, 0].max(), w[:, 1].min(), w[:, 1].max()]
+                for w in self.ways
+            ])
+        else:
+            self.bboxes = np.empty((0, 4))
+
+        logger.info(f"RoadSampler: {len(self.ways)} vias carregadas de {self.path.name}")
+
+    def _load_geojson(self) -> List[np.ndarray]:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        ways = []
+        for feature in data.get("features", []):
+            props = feature.get("properties") or {}
+            if props.get("highway") not in self.highway_types:
+                continue
+
+            geom = feature.get("geometry") or {}
+            if geom.get("type") == "LineString":
+                lines = [geom["coordinates"]]
+            elif geom.get("type") == "MultiLineString":
+                lines = geom["coordinates"]
+            else:
+                continue
+
+            # GeoJSON usa [lon, lat]
+            for line in lines:
+                ways.append(np.array(line, dtype=float)[:, [1, 0]])
+
+        return ways
+
+    def _load_pbf(self) -> List[np.ndarray]:
+        try:
+            import osmium
+        except ImportError:
+            raise ImportError(
+                "Leitura de .pbf requer o pacote 'osmium' (pip install osmium). "
+                "Alternativa: converter o extrato para GeoJSON."
+            )
+
+        highway_types = self.highway_types
+        ways = []
+
+        class Handler(osmium.SimpleHandler):
+            def way(self, w):
+                if w.tags.get("highway") not in highway_types:
+                    return
+                try:
+                    ways.append(np.array([[n.lat, n.lon] for n in w.nodes], dtype=float))
+                except osmium.InvalidLocationError:
+                    pass
+
+        Handler().apply_file(str(self.path), locations=True)
+        return ways
+
+    def sample(
+        self,
+        center_lat: float,
+        center_lon: float,
+        radius_m: float,
+        spacing_m: float,
+        inner_radius_m: float = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pontos a cada `spacing_m` metros ao longo das vias dentro do raio
+        (ou do anel inner_radius_m < d <= radius_m).
+
+        Pontos de vias diferentes mais próximos que spacing/2 (cruzamentos)
+        são fundidos.
+
+        Returns:
+            (lats, lons) como arrays NumPy
+        """
+        dlat, dlon = deg_per_m(center_lat)
+
+        # Vias cujo bbox intersecta o quadrado do raio
+        r_lat, r_lon = radius_m * dlat, radius_m * dlon
+        near = (
+            (self.bboxes[:, 1] >= center_lat - r_lat) & (self.bboxes[:, 0] <= center_lat + r_lat) &
+            (self.bboxes[:, 3] >= center_lon - r_lon) & (self.bboxes[:, 2] <= center_lon + r_lon)
+        )
+
+        samples = []
+        for idx in np.flatnonzero(near):
+            # Coordenadas locais em metros (equiretangular ao redor do centro)
+            way = self.ways[idx]
+            xy = np.column_stack([
+                (way[:, 1] - center_lon) / dlon,
+                (way[:, 0] - center_lat) / dlat
+            ])
+
+            seg_len = np.hypot(*np.diff(xy, axis=0).T)
+            cum = np.concatenate([[0.0], np.cumsum(seg_len)])
+            if cum[-1] == 0:
+                continue
+
+            # Posições ao longo da via (inclui o primeiro vértice)
+            pos = np.arange(0.0, cum[-1] + 1e-9, spacing_m)
+            samples.append(np.column_stack([
+                np.interp(pos, cum, xy[:, 0]),
+                np.interp(pos, cum, xy[:, 1])
+            ]))
+
+        if not samples:
+            return np.empty(0), np.empty(0)
+
+        pts = np.vstack(samples)
+        dist = np.hypot(pts[:, 0], pts[:, 1])
+        pts = pts[(dist <= radius_m) & (dist > inner_radius_m)]
+
+        # Fundir pontos próximos (quantização em células de spacing/2)
+        cells = np.round(pts / (spacing_m / 2)).astype(np.int64)
+        _, keep = np.unique(cells, axis=0, return_index=True)
+        pts = pts[np.sort(keep)]
+
+        return center_lat + pts[:, 1] * dlat, center_lon + pts[:, 0] * dlon
+
+    def bearing_at(self, lat: float, lon: float, max_dist_m: float = 25) -> Optional[float]:
+        """
+        Azimute (0-180°, a partir do norte) do segmento de via mais próximo
+        de (lat, lon), ou None se nenhuma via está a até max_dist_m.
+        """
+        dlat, dlon = deg_per_m(lat)
+        r_lat, r_lon = max_dist_m * dlat, max_dist_m * dlon
+        near = (
+            (self.bboxes[:, 1] >= lat - r_lat) & (self.bboxes[:, 0] <= lat + r_lat) &
+            (self.bboxes[:, 3] >= lon - r_lon) & (self.bboxes[:, 2] <= lon + r_lon)
+        )
+
+        best_dist, best_bearing = max_dist_m, None
+        for idx in np.flatnonzero(near):
+            way = self.ways[idx]
+            xy = np.column_stack([(way[:, 1] - lon) / dlon, (way[:, 0] - lat) / dlat])
+            a, b = xy[:-1], xy[1:]
+            ab = b - a
+            seg_len2 = (ab ** 2).sum(axis=1)
+            valid = seg_len2 > 0
+            if not valid.any():
+                continue
+
+            # Distância da origem (o ponto consultado) a cada segmento
+            t = np.zeros(len(ab))
+            t[valid] = np.clip(-(a[valid] * ab[valid]).sum(axis=1) / seg_len2[valid], 0, 1)
+            dist = np.hypot(*(a + t[:, None] * ab).T)
+            dist[~valid] = np.inf
+
+            i = int(np.argmin(dist))
+            if dist[i] < best_dist:
+                best_dist = dist[i]
+                best_bearing = float(np.degrees(np.arctan2(ab[i, 0], ab[i, 1])) % 180)
+
+        return best_bearing
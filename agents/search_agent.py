@@ -3,17 +3,32 @@ Agente 2: Busca Geográfica Inteligente
 Implementa estratégia de funil (macro → micro) para encontrar candidatos
 """
 
+import hashlib
 import logging
-import time
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlencode
 import pandas as pd
 import numpy as np
 from tqdm import tqdm
 
-from config import GOOGLE_KEY, SEARCH_CONFIG, CACHE_DIR
+from config import GOOGLE_KEY, SEARCH_CONFIG, CACHE_DIR, CACHE_CONFIG, API_CONFIG
+from .cache import DiskCache
+from .download_planner import DownloadPlanner
+from .journal import RunJournal
+from .geo_utils import generate_grid
+from .heading_planner import HeadingPlanner
+from .image_store import StreetViewImageStore
+from .pano_index import PanoIndex
+from .precrawl_catalog import PrecrawlCatalog
+from .rate_limit import TokenBucket
+from .road_sampler import RoadSampler
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +50,98 @@ class SearchAgent:
         self.cache_dir = CACHE_DIR / "search"
         self.cache_dir.mkdir(exist_ok=True, parents=True)
         
+        # Endpoints (sobrescrevíveis para testes contra servidor local)
+        self.sv_metadata_url = f"{API_CONFIG['maps_base_url']}/maps/api/streetview/metadata"
+        self.sv_static_url = f"{API_CONFIG['maps_base_url']}/maps/api/streetview"
+        self.places_url = f"{API_CONFIG['places_base_url']}/v1/places:searchText"
+        
+        # Sessão HTTP com pool de conexões keep-alive compartilhado entre threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=max(
+                SEARCH_CONFIG["metadata_workers"],
+                SEARCH_CONFIG["download_workers"]
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # Limitadores de taxa compartilhados (substituem sleeps fixos)
+        self.rate_limiter = TokenBucket(SEARCH_CONFIG["requests_per_second"])
+        self.download_rate_limiter = TokenBucket(SEARCH_CONFIG["downloads_per_second"])
+        
+        # Cache persistente de Street View Metadata
+        self.metadata_cache = None
+        if CACHE_CONFIG["enabled"] and CACHE_CONFIG["cache_street_view"]:
+            self.metadata_cache = DiskCache(
+                self.cache_dir / "sv_metadata.sqlite",
+                table="sv_metadata",
+                ttl_days=CACHE_CONFIG["ttl_days"]
+            )
+        
+        # Índice espacial local de panoramas conhecidos
+        self.pano_index = None
+        if SEARCH_CONFIG["pano_index"]:
+            self.pano_index = PanoIndex(
+                self.cache_dir / "pano_index.sqlite",
+                cell_m=SEARCH_CONFIG["pano_index_cell_m"],
+                ttl_days=CACHE_CONFIG["ttl_days"]
+            )
+            logger.info(f"Índice local com {len(self.pano_index)} panoramas conhecidos")
+        
+        # Cache persistente de buscas Places
+        self.places_cache = None
+        if CACHE_CONFIG["enabled"] and CACHE_CONFIG["cache_places"]:
+            self.places_cache = DiskCache(
+                self.cache_dir / "places.sqlite",
+                table="places",
+                ttl_days=CACHE_CONFIG["ttl_days"]
+            )
+        
+        # Amostragem ao longo das ruas (opcional, extrato OSM local)
+        self.road_sampler = None
+        if SEARCH_CONFIG["osm_extract_path"]:
+            self.road_sampler = RoadSampler(
+                SEARCH_CONFIG["osm_extract_path"],
+                SEARCH_CONFIG["osm_highway_types"]
+            )
+        
+        # Catálogo de áreas pré-varridas (precrawl.py)
+        self.catalog = None
+        if SEARCH_CONFIG["use_precrawl"]:
+            self.catalog = PrecrawlCatalog(
+                SEARCH_CONFIG["precrawl_dir"],
+                tile_m=SEARCH_CONFIG["precrawl_tile_m"]
+            )
+        
+        # Headings voltados às fachadas (perpendiculares à rua); o raio dos
+        # vizinhos acompanha o espaçamento da última amostragem
+        self.sampling_spacing_m = SEARCH_CONFIG["grid_spacing_m"]
+        self.heading_planner = None
+        if SEARCH_CONFIG["heading_mode"] == "facade":
+            self.heading_planner = HeadingPlanner(
+                SEARCH_CONFIG["sv_headings"],
+                road_sampler=self.road_sampler,
+                pano_index=self.pano_index,
+                neighbor_radius_m=SEARCH_CONFIG["heading_neighbor_radius_m"],
+                spacing_factor=SEARCH_CONFIG["heading_neighbor_spacing_factor"],
+                snap_min_m=SEARCH_CONFIG["heading_snap_min_m"],
+                diagonals=SEARCH_CONFIG["facade_diagonals"],
+                target_views=SEARCH_CONFIG["places_target_views"],
+                fov=SEARCH_CONFIG["sv_fov"]
+            )
+        
+        # Ordem dos downloads sob orçamento fixo
+        self.download_planner = DownloadPlanner(
+            sectors=SEARCH_CONFIG["priority_sectors"],
+            ring_m=SEARCH_CONFIG["priority_ring_m"],
+            hint_radius_m=SEARCH_CONFIG["priority_hint_radius_m"]
+        )
+        
+        self.download_stats = {}
+        self.journal = None
+        
         logger.info("SearchAgent inicializado")
     
     def search_area(
@@ -44,7 +151,10 @@ class SearchAgent:
         radius_m: int = None,
         city: str = None,
         neighborhood: str = None,
-        text_hints: Dict = None
+        text_hints: Dict = None,
+        inner_radius_m: int = 0,
+        exclude_pano_ids: set = None,
+        spacing_m: int = None
     ) -> List[Dict]:
         """
         Busca candidatos na área especificada.
@@ -53,10 +163,23 @@ class SearchAgent:
         1. Se houver dicas textuais (nome do condomínio, rua) → busca direta
         2. Caso contrário → busca de condomínios + grid search
         
+        Busca incremental: com inner_radius_m > 0 só o anel
+        inner_radius_m < d <= radius_m é amostrado, e panos em
+        exclude_pano_ids (já vistos em raios menores) são descartados.
+        
+        spacing_m (padrão: grid_spacing_m) permite a grade grossa da
+        primeira etapa do funil.
+        
         Returns:
             Lista de coordenadas candidatas com metadados
         """
         radius_m = radius_m or SEARCH_CONFIG["initial_radius_m"]
+        spacing_m = spacing_m or SEARCH_CONFIG["grid_spacing_m"]
+        
+        # Contagens de download valem por busca (um anel sem candidatos
+        # não herda as do anel anterior)
+        self.download_stats = {}
+        self.sampling_spacing_m = spacing_m
         
         candidates = []
         
@@ -76,44 +199,69 @@ class SearchAgent:
                 "type": "condominium"
             })
         
-        # Passo 2: Grid Search (pontos espaçados)
+        # Passo 2: Grid Search (pontos espaçados; ao longo das ruas se houver extrato OSM)
         logger.info("Gerando grid de busca...")
-        grid_points = self._generate_grid(
+        grid_lats, grid_lons, point_type = self._sample_points(
             center_lat, center_lon, radius_m, 
-            spacing=SEARCH_CONFIG["grid_spacing_m"]
+            spacing=spacing_m,
+            inner_radius_m=inner_radius_m
         )
-        logger.info(f"Grid com {len(grid_points)} pontos")
         
-        for lat, lon in grid_points:
+        # Tiles pré-varridos → panos do catálogo; só o resto da grade é varrido
+        cataloged, grid_lats, grid_lons = self._split_by_catalog(
+            center_lat, center_lon, radius_m, grid_lats, grid_lons, inner_radius_m
+        )
+        logger.info(f"Grid com {len(grid_lats)} pontos ({point_type}, {spacing_m}m)")
+        
+        for lat, lon in zip(grid_lats.tolist(), grid_lons.tolist()):
             candidates.append({
                 "lat": lat,
                 "lon": lon,
                 "source": "grid_search",
-                "type": "grid_point"
+                "type": point_type
             })
         
-        # Passo 3: Verificar disponibilidade de Street View
+        # Passo 3: Verificar disponibilidade de Street View (catálogo já verificado)
         logger.info("Verificando Street View disponível...")
-        candidates_with_sv = self._filter_by_street_view(candidates)
+        candidates_with_sv = self._filter_by_street_view(candidates) + cataloged
+        candidates_with_sv = self._dedupe_by_pano(candidates_with_sv)
+        
+        if exclude_pano_ids:
+            candidates_with_sv = [
+                c for c in candidates_with_sv
+                if c.get("sv_pano_id") not in exclude_pano_ids
+            ]
         
         logger.info(f"Total de candidatos com Street View: {len(candidates_with_sv)}")
         
         return candidates_with_sv
     
-    def refine_search(self, candidate_coords: Tuple[float, float]) -> List[Dict]:
+    def refine_search(
+        self,
+        candidate_coords: Tuple[float, float],
+        radius_m: int = None,
+        exclude_pano_ids: set = None
+    ) -> List[Dict]:
         """
         Refinamento: cria grid denso ao redor de um candidato promissor.
+        
+        Panos em exclude_pano_ids (já baixados na etapa grossa) são
+        descartados; tiles pré-varridos vêm do catálogo.
         """
         lat, lon = candidate_coords
-        radius = SEARCH_CONFIG["refinement_radius_m"]
+        radius = radius_m or SEARCH_CONFIG["refinement_radius_m"]
         spacing = SEARCH_CONFIG["refinement_spacing_m"]
+        self.sampling_spacing_m = spacing
         
         logger.info(f"Refinando busca ao redor de ({lat:.6f}, {lon:.6f})")
         
-        grid = self._generate_grid(lat, lon, radius, spacing)
+        grid_lats, grid_lons, _ = self._sample_points(lat, lon, radius, spacing)
+        cataloged, grid_lats, grid_lons = self._split_by_catalog(
+            lat, lon, radius, grid_lats, grid_lons
+        )
         
         candidates = []
-        for glat, glon in grid:
+        for glat, glon in zip(grid_lats.tolist(), grid_lons.tolist()):
             candidates.append({
                 "lat": glat,
                 "lon": glon,
@@ -122,7 +270,10 @@ class SearchAgent:
             })
         
         # Filtrar por Street View
-        refined = self._filter_by_street_view(candidates)
+        refined = self._filter_by_street_view(candidates) + cataloged
+        refined = self._dedupe_by_pano(refined)
+        if exclude_pano_ids:
+            refined = [c for c in refined if c.get("sv_pano_id") not in exclude_pano_ids]
         logger.info(f"Refinamento gerou {len(refined)} pontos com SV")
         
         return refined
@@ -150,10 +301,13 @@ class SearchAgent:
         
         all_results = []
         
-        for query in queries:
-            results = self._places_text_search(query, lat, lon, radius_m)
-            all_results.extend(results)
-            time.sleep(SEARCH_CONFIG["request_delay"])
+        # Consultas em paralelo (cada uma pagina sequencialmente)
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            for results in pool.map(
+                lambda q: self._cached_places_text_search(q, lat, lon, radius_m),
+                queries
+            ):
+                all_results.extend(results)
         
         # Remover duplicatas por nome e coordenadas
         df = pd.DataFrame(all_results)
@@ -163,6 +317,33 @@ class SearchAgent:
         
         return []
     
+    def _cached_places_text_search(
+        self,
+        query: str,
+        lat: float,
+        lon: float,
+        radius_m: int
+    ) -> List[Dict]:
+        """
+        Text Search com cache persistente (query + location bias + raio).
+        """
+        if self.places_cache is None:
+            return self._places_text_search(query, lat, lon, radius_m)
+        
+        key = f"{query}|{lat:.5f},{lon:.5f}|{int(radius_m)}"
+        results = self.places_cache.get(key)
+        if results is not None:
+            logger.info(f"Places (cache): '{query}' → {len(results)} resultados")
+            return results
+        
+        results = self._places_text_search(query, lat, lon, radius_m)
+        
+        # Resultado vazio pode ser erro de rede/cota: não cachear
+        if results:
+            self.places_cache.set(key, results)
+        
+        return results
+    
     def _places_text_search(
         self, 
         query: str, 
@@ -173,7 +354,7 @@ class SearchAgent:
         """
         Places API (New) - Text Search
         """
-        url = "https://places.googleapis.com/v1/places:searchText"
+        url = self.places_url
         
         headers = {
             "Content-Type": "application/json",
@@ -199,8 +380,10 @@ class SearchAgent:
             if page_token:
                 body["pageToken"] = page_token
             
+            self.rate_limiter.acquire()
+            
             try:
-                r = requests.post(url, headers=headers, json=body, timeout=30)
+                r = self.session.post(url, headers=headers, json=body, timeout=30)
                 r.raise_for_status()
                 data = r.json()
                 
@@ -222,65 +405,88 @@ class SearchAgent:
         
         return results
     
-    def _generate_grid(
-        self, 
-        center_lat: float, 
-        center_lon: float, 
-        radius_m: int, 
-        spacing: int
-    ) -> List[Tuple[float, float]]:
+    def _sample_points(
+        self,
+        center_lat: float,
+        center_lon: float,
+        radius_m: int,
+        spacing: int,
+        inner_radius_m: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray, str]:
         """
-        Gera grid de pontos espaçados uniformemente.
+        Pontos de amostragem da área: ao longo das ruas (RoadSampler) quando
+        há extrato OSM configurado, senão grade regular.
         
-        spacing: espaçamento em metros
+        Returns:
+            (lats, lons, tipo_do_ponto)
         """
-        # Conversão aproximada: 1 grau = ~111km
-        deg_per_m_lat = 1 / 111000
-        deg_per_m_lon = 1 / (111000 * np.cos(np.radians(center_lat)))
+        if self.road_sampler is not None:
+            lats, lons = self.road_sampler.sample(
+                center_lat, center_lon, radius_m, spacing, inner_radius_m
+            )
+            return lats, lons, "road_point"
         
-        radius_deg_lat = radius_m * deg_per_m_lat
-        radius_deg_lon = radius_m * deg_per_m_lon
+        lats, lons = self._generate_grid(
+            center_lat, center_lon, radius_m, spacing, inner_radius_m=inner_radius_m
+        )
+        return lats, lons, "grid_point"
+    
+    def _split_by_catalog(
+        self,
+        center_lat: float,
+        center_lon: float,
+        radius_m: float,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        inner_radius_m: float = 0
+    ) -> Tuple[List[Dict], np.ndarray, np.ndarray]:
+        """
+        Cobertura parcial do catálogo pré-varrido: os panos dos tiles já
+        concluídos vêm do catálogo e só os pontos de amostragem dos demais
+        tiles seguem para a Metadata API.
         
-        spacing_deg_lat = spacing * deg_per_m_lat
-        spacing_deg_lon = spacing * deg_per_m_lon
+        Returns:
+            (candidatos do catálogo, lats restantes, lons restantes)
+        """
+        if self.catalog is None:
+            return [], lats, lons
+        
+        done = self.catalog.done_tiles(center_lat, center_lon, radius_m)
+        if not done:
+            return [], lats, lons
         
-        lats = np.arange(
-            center_lat - radius_deg_lat,
-            center_lat + radius_deg_lat,
-            spacing_deg_lat
+        cataloged = self.catalog.candidates(
+            center_lat, center_lon, radius_m, inner_radius_m, tile_ids=done
         )
-        lons = np.arange(
-            center_lon - radius_deg_lon,
-            center_lon + radius_deg_lon,
-            spacing_deg_lon
+        covered = self.catalog.in_tiles(lats, lons, done)
+        logger.info(
+            f"Catálogo pré-varrido: {len(done)}/"
+            f"{len(self.catalog.tiles_for_disk(center_lat, center_lon, radius_m))} tiles, "
+            f"{len(cataloged)} panos ({int(covered.sum())} pontos da grade dispensados)"
         )
-        
-        points = []
-        for lat in lats:
-            for lon in lons:
-                # Verificar se está dentro do círculo
-                dist = self._haversine_distance(center_lat, center_lon, lat, lon)
-                if dist <= radius_m:
-                    points.append((lat, lon))
-        
-        return points
+        return cataloged, lats[~covered], lons[~covered]
     
-    def _haversine_distance(self, lat1, lon1, lat2, lon2):
-        """
-        Calcula distância entre dois pontos em metros.
+    def _generate_grid(
+        self, 
+        center_lat: float, 
+        center_lon: float, 
+        radius_m: int, 
+        spacing: int,
+        layout: str = None,
+        inner_radius_m: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
-        R = 6371000  # raio da Terra em metros
-        
-        phi1 = np.radians(lat1)
-        phi2 = np.radians(lat2)
-        delta_phi = np.radians(lat2 - lat1)
-        delta_lambda = np.radians(lon2 - lon1)
+        Gera grid de pontos espaçados uniformemente (vetorizado).
         
-        a = np.sin(delta_phi/2)**2 + \
-            np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda/2)**2
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+        spacing: espaçamento em metros
+        layout: "square" ou "hex" (padrão: SEARCH_CONFIG["grid_layout"])
+        inner_radius_m: se > 0, gera apenas o anel externo
         
-        return R * c
+        Returns:
+            (lats, lons) como arrays NumPy
+        """
+        layout = layout or SEARCH_CONFIG["grid_layout"]
+        return generate_grid(center_lat, center_lon, radius_m, spacing, layout, inner_radius_m)
     
     def _filter_by_street_view(self, candidates: List[Dict]) -> List[Dict]:
         """
@@ -288,11 +494,32 @@ class SearchAgent:
         """
         min_year = SEARCH_CONFIG["sv_min_year"]
         filtered = []
+        cache_hits = 0
+        index_hits_before = self.pano_index.hits if self.pano_index else 0
+        disk_hits_before = self.metadata_cache.hits if self.metadata_cache else 0
+        
+        # Consultas concorrentes; o token bucket controla a taxa global.
+        # Fila limitada: grades de milhões de pontos não viram milhões de
+        # futures em memória
+        workers = SEARCH_CONFIG["metadata_workers"]
+        window = workers * SEARCH_CONFIG["metadata_queue_factor"]
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as pool, tqdm(
+            total=len(candidates), desc="Verificando Street View"
+        ) as progress:
+            pending = deque()
+            for cand in candidates:
+                pending.append(pool.submit(self._checked_metadata, cand["lat"], cand["lon"]))
+                if len(pending) >= window:
+                    results.append(pending.popleft().result())
+                    progress.update()
+            while pending:
+                results.append(pending.popleft().result())
+                progress.update()
         
-        for cand in tqdm(candidates, desc="Verificando Street View"):
+        for cand, (meta, from_cache) in zip(candidates, results):
             lat, lon = cand["lat"], cand["lon"]
-            
-            meta = self._sv_metadata(lat, lon)
+            cache_hits += from_cache
             
             if meta.get("status") != "OK":
                 continue
@@ -315,117 +542,482 @@ class SearchAgent:
             cand["sv_lon"] = meta.get("location", {}).get("lng", lon)
             
             filtered.append(cand)
-            
-            time.sleep(SEARCH_CONFIG["request_delay"])
+        
+        # from_cache cobre índice, cache em disco e journal; os dois
+        # primeiros têm contadores próprios, o resto veio do journal
+        index_hits = (self.pano_index.hits if self.pano_index else 0) - index_hits_before
+        disk_hits = (self.metadata_cache.hits if self.metadata_cache else 0) - disk_hits_before
+        logger.info(
+            f"SV metadata: {index_hits} do índice local, "
+            f"{disk_hits} do cache, "
+            f"{cache_hits - index_hits - disk_hits} do journal, "
+            f"{len(candidates) - cache_hits} consultas à API "
+            f"({self.rate_limiter.backoffs} backoffs por cota)"
+        )
         
         return filtered
     
+    def _dedupe_by_pano(self, candidates: List[Dict]) -> List[Dict]:
+        """
+        Colapsa candidatos que apontam para o mesmo panorama (sv_pano_id).
+        
+        Mantém o primeiro candidato de cada pano (Places vem antes do grid)
+        e registra a proveniência:
+        - sources: origens que caíram no pano (ex: ["places_api", "grid_search"])
+        - merged_count: quantos candidatos foram colapsados
+        """
+        by_pano = {}
+        
+        for cand in candidates:
+            pano_id = cand.get("sv_pano_id")
+            if not pano_id:
+                # Sem pano_id não há como deduplicar
+                by_pano[id(cand)] = cand
+                cand.setdefault("sources", [cand.get("source")])
+                cand.setdefault("merged_count", 1)
+                continue
+            
+            kept = by_pano.get(pano_id)
+            if kept is None:
+                cand["sources"] = [cand.get("source")]
+                cand["merged_count"] = 1
+                by_pano[pano_id] = cand
+                continue
+            
+            kept["merged_count"] += 1
+            if cand.get("source") not in kept["sources"]:
+                kept["sources"].append(cand.get("source"))
+            
+            # Preservar nome/endereço de um hit do Places
+            if not kept.get("name") and cand.get("name"):
+                kept["name"] = cand["name"]
+                kept["address"] = cand.get("address", "")
+        
+        deduped = list(by_pano.values())
+        logger.info(f"Deduplicação por pano_id: {len(candidates)} → {len(deduped)} candidatos")
+        
+        return deduped
+    
+    def start_journal(self, run_key: str):
+        """
+        Abre (ou retoma) o journal da execução identificada por run_key.
+        
+        Enquanto aberto, consultas de metadados e downloads concluídos são
+        registrados assim que terminam; se a execução cair, a próxima com
+        o mesmo run_key não repete nenhum deles e desconta do orçamento os
+        downloads já feitos.
+        """
+        if not SEARCH_CONFIG["resume_journal"]:
+            return
+        self.finish_journal(discard=False)
+        digest = hashlib.sha1(run_key.encode("utf-8")).hexdigest()[:16]
+        self.journal = RunJournal(CACHE_DIR / "journal" / f"{digest}.jsonl")
+    
+    def finish_journal(self, discard: bool = True):
+        """
+        Fecha o journal; discard=True (execução concluída) apaga o arquivo.
+        """
+        if self.journal is not None:
+            self.journal.close(discard=discard)
+            self.journal = None
+    
+    def _checked_metadata(self, lat: float, lon: float) -> Tuple[Dict, bool]:
+        """
+        _get_sv_metadata passando pelo journal da execução, se houver.
+        """
+        journal = self.journal
+        if journal is not None:
+            meta = journal.meta(lat, lon)
+            if meta is not None:
+                return meta, True
+        
+        meta, from_cache = self._get_sv_metadata(lat, lon)
+        if journal is not None:
+            journal.record_meta(lat, lon, meta)
+        return meta, from_cache
+    
+    def _get_sv_metadata(self, lat: float, lon: float) -> Tuple[Dict, bool]:
+        """
+        Street View Metadata: índice espacial local → cache exato → API.
+        
+        Returns:
+            (metadados, veio_do_cache)
+        """
+        if self.pano_index is not None:
+            meta = self.pano_index.lookup(lat, lon, SEARCH_CONFIG["pano_index_tolerance_m"])
+            if meta is not None:
+                return meta, True
+        
+        key = self._metadata_key(lat, lon)
+        meta = self.metadata_cache.get(key) if self.metadata_cache else None
+        from_cache = meta is not None
+        
+        if not from_cache:
+            meta = self._sv_metadata(lat, lon)
+        
+        # Respostas novas da API alimentam o índice local (uma entrada do
+        # cache regravada no índice ganharia um updated_at novo e
+        # sobreviveria além do ttl_days)
+        if self.pano_index is not None and not from_cache:
+            self.pano_index.add_probe(lat, lon, meta)
+        
+        # Só cachear respostas definitivas (erros/cota são transitórios)
+        if (
+            not from_cache and self.metadata_cache is not None
+            and meta.get("status") in ("OK", "ZERO_RESULTS", "NOT_FOUND")
+        ):
+            self.metadata_cache.set(key, {
+                "status": meta["status"],
+                "pano_id": meta.get("pano_id"),
+                "date": meta.get("date", ""),
+                "location": meta.get("location", {})
+            })
+        
+        return meta, from_cache
+    
+    def _metadata_key(self, lat: float, lon: float) -> str:
+        """
+        Chave do cache: lat/lon quantizados (5 casas decimais ≈ 1m).
+        """
+        decimals = SEARCH_CONFIG["metadata_cache_decimals"]
+        return f"{lat:.{decimals}f},{lon:.{decimals}f}"
+    
     def _sv_metadata(self, lat: float, lon: float) -> Dict:
         """
         Street View Metadata API
+        
+        Respeita o token bucket e, em caso de 429 / OVER_QUERY_LIMIT,
+        aplica backoff exponencial e tenta novamente.
         """
-        url = "https://maps.googleapis.com/maps/api/streetview/metadata?" + urlencode({
+        params = {
             "location": f"{lat},{lon}",
             "key": self.api_key
-        })
+        }
         
-        try:
-            r = requests.get(url, timeout=20)
-            r.raise_for_status()
-            return r.json()
-        except requests.RequestException as e:
-            logger.error(f"Erro ao buscar SV metadata: {e}")
-            return {"status": "ERROR"}
+        for attempt in range(SEARCH_CONFIG["max_retries"] + 1):
+            self.rate_limiter.acquire()
+            
+            try:
+                r = self.session.get(self.sv_metadata_url, params=params, timeout=20)
+                over_quota = r.status_code == 429
+                if not over_quota:
+                    r.raise_for_status()
+                    data = r.json()
+                    over_quota = data.get("status") == "OVER_QUERY_LIMIT"
+            except (requests.RequestException, ValueError) as e:
+                logger.error(f"Erro ao buscar SV metadata: {e}")
+                return {"status": "ERROR"}
+            
+            if over_quota:
+                self.rate_limiter.backoff(SEARCH_CONFIG["backoff_base_s"] * 2 ** attempt)
+                continue
+            
+            self.rate_limiter.recover()
+            return data
+        
+        logger.warning(f"Cota excedida em ({lat:.6f}, {lon:.6f}) após {attempt + 1} tentativas")
+        return {"status": "OVER_QUERY_LIMIT"}
     
     def download_street_views(
         self, 
         candidates: List[Dict], 
-        output_dir: Path
+        output_dir: Path,
+        max_downloads: int = None,
+        center: Tuple[float, float] = None,
+        text_hints: Dict = None,
+        size: str = None
     ) -> pd.DataFrame:
         """
         Baixa imagens do Street View para todos os candidatos.
         
+        output_dir é a raiz de um StreetViewImageStore: cada imagem é
+        endereçada por (pano_id, heading, fov, size), então imagens de
+        execuções anteriores só são reutilizadas se forem do mesmo panorama.
+        
+        Downloads concorrentes (SEARCH_CONFIG["download_workers"]) sobre a
+        sessão HTTP com keep-alive, gravando direto em disco em streaming.
+        O limite max_downloads (padrão: max_sv_downloads) é respeitado
+        exatamente: cada download reserva uma vaga antes de começar e a
+        devolve se falhar. Contagens ficam em self.download_stats.
+        
+        Com center informado, a ordem (e portanto o que cabe no orçamento)
+        vem do DownloadPlanner: Places/dicas textuais primeiro, depois a
+        área inteira estratificada por anel e setor.
+        
+        size (padrão: sv_thumb_size com two_pass_download, senão sv_size):
+        no modo de duas passadas esta é a triagem CLIP em miniatura; só as
+        aprovadas são baixadas em resolução cheia (fetch_full_size).
+        
         Returns:
             DataFrame com metadados dos downloads
         """
-        output_dir = Path(output_dir)
-        output_dir.mkdir(exist_ok=True, parents=True)
+        store = StreetViewImageStore(output_dir)
+        fov = SEARCH_CONFIG["sv_fov"]
+        size = size or self.screening_size()
         
-        rows = []
-        download_count = 0
-        max_downloads = SEARCH_CONFIG["max_sv_downloads"]
+        if max_downloads is None:
+            max_downloads = SEARCH_CONFIG["max_sv_downloads"]
+        budget_lock = threading.Lock()
+        counters = {"reserved": 0, "skipped": 0}
         
-        for i, cand in enumerate(tqdm(candidates, desc="Baixando Street Views")):
-            if download_count >= max_downloads:
-                logger.warning(f"Limite de {max_downloads} downloads atingido")
-                break
-            
+        def reserve() -> bool:
+            with budget_lock:
+                if counters["reserved"] >= max_downloads:
+                    counters["skipped"] += 1
+                    return False
+                counters["reserved"] += 1
+                return True
+        
+        def release():
+            with budget_lock:
+                counters["reserved"] -= 1
+        
+        # Headings por candidato (fachadas, se houver direção da rua)
+        if self.heading_planner is not None:
+            self.heading_planner.plan(candidates, spacing_m=self.sampling_spacing_m)
+        
+        # Tarefas em ordem de prioridade/heading (a ordem define o que cabe no limite)
+        if center is not None:
+            order = self.download_planner.order(candidates, center[0], center[1], text_hints)
+        else:
+            order = range(len(candidates))
+        
+        tasks = []
+        seen = set()
+        for i in order:
+            cand = candidates[i]
             lat = cand.get("sv_lat", cand["lat"])
             lon = cand.get("sv_lon", cand["lon"])
-            
-            for heading in SEARCH_CONFIG["sv_headings"]:
-                filename = f"sv_{i:04d}_h{heading}.jpg"
-                filepath = output_dir / filename
-                
-                # Pular se já existe
-                if filepath.exists():
-                    rows.append({
-                        "candidate_idx": i,
-                        "lat": lat,
-                        "lon": lon,
-                        "heading": heading,
-                        "filename": filename,
-                        "source": cand.get("source"),
-                        "name": cand.get("name", ""),
-                        "address": cand.get("address", "")
-                    })
+            pano_id = cand.get("sv_pano_id")
+            for heading in cand.get("headings") or SEARCH_CONFIG["sv_headings"]:
+                filename = store.relpath(pano_id, heading, fov, size, lat=lat, lon=lon)
+                if filename in seen:
                     continue
-                
-                # Baixar
-                url = self._sv_static_url(lat, lon, heading)
-                
-                try:
-                    r = requests.get(url, timeout=30)
-                    r.raise_for_status()
-                    
-                    with open(filepath, "wb") as f:
-                        f.write(r.content)
-                    
-                    rows.append({
-                        "candidate_idx": i,
-                        "lat": lat,
-                        "lon": lon,
-                        "heading": heading,
-                        "filename": filename,
-                        "source": cand.get("source"),
-                        "name": cand.get("name", ""),
-                        "address": cand.get("address", "")
-                    })
-                    
-                    download_count += 1
-                    time.sleep(SEARCH_CONFIG["request_delay"])
-                    
-                except requests.RequestException as e:
-                    logger.error(f"Erro ao baixar {filename}: {e}")
+                seen.add(filename)
+                tasks.append((i, cand, lat, lon, heading, filename))
         
+        # Downloads já feitos por esta execução antes de uma interrupção
+        # continuam contando no limite
+        journal = self.journal
+        if journal is not None:
+            counters["reserved"] = sum(
+                1 for task in tasks
+                if journal.has_image(task[-1]) and store.exists(task[-1])
+            )
+        
+        def fetch(task) -> Optional[Dict]:
+            i, cand, lat, lon, heading, filename = task
+            filepath = store.resolve(filename)
+            row = self._sv_row(i, cand, lat, lon, heading, filename)
+            
+            # Reutilizar se já está no store (não conta no limite,
+            # a não ser que o journal diga que foi baixada nesta execução)
+            if filepath.exists():
+                return row
+            
+            if not reserve():
+                return None
+            
+            self.download_rate_limiter.acquire()
+            url = self._sv_static_url(
+                lat, lon, heading, pano_id=cand.get("sv_pano_id"), size=size
+            )
+            filepath.parent.mkdir(exist_ok=True)
+            
+            try:
+                self._stream_to_file(url, filepath)
+                if journal is not None:
+                    journal.record_image(filename, row)
+                return row
+            except requests.RequestException as e:
+                release()
+                logger.error(f"Erro ao baixar {filename}: {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=SEARCH_CONFIG["download_workers"]) as pool:
+            results = list(tqdm(
+                pool.map(fetch, tasks),
+                total=len(tasks),
+                desc="Baixando Street Views"
+            ))
+        
+        if counters["skipped"]:
+            logger.warning(
+                f"Limite de {max_downloads} downloads atingido "
+                f"({counters['skipped']} imagens não baixadas)"
+            )
+        
+        rows = [row for row in results if row is not None]
         df = pd.DataFrame(rows)
-        logger.info(f"Total de imagens baixadas: {download_count}")
+        self.download_stats = {
+            "downloaded": counters["reserved"],
+            "reused": len(rows) - counters["reserved"],
+            "skipped": counters["skipped"]
+        }
+        logger.info(
+            f"Total de imagens baixadas: {counters['reserved']} "
+            f"(reutilizadas do store: {self.download_stats['reused']})"
+        )
         
         return df
     
-    def _sv_static_url(self, lat: float, lon: float, heading: int) -> str:
+    def screening_size(self) -> str:
+        """
+        Resolução da primeira passada de downloads (triagem CLIP).
+        """
+        if SEARCH_CONFIG["two_pass_download"]:
+            return SEARCH_CONFIG["sv_thumb_size"]
+        return SEARCH_CONFIG["sv_size"]
+    
+    def fetch_full_size(
+        self,
+        sv_metadata: pd.DataFrame,
+        output_dir: Path,
+        max_downloads: int = None
+    ) -> pd.DataFrame:
+        """
+        Segunda passada: baixa em sv_size as imagens de sv_metadata
+        (tipicamente só as aprovadas na triagem CLIP), para SIFT e LLM.
+        
+        max_downloads (padrão: sem limite) é respeitado exatamente, como em
+        download_street_views; os downloads feitos entram em
+        self.download_stats ("full_size" e o total "downloaded").
+        
+        Returns:
+            Cópia de sv_metadata com "filename" apontando para a imagem
+            cheia e a miniatura em "thumb_filename". Se o download falhar
+            (ou não couber no limite), a linha mantém a miniatura.
+        """
+        store = StreetViewImageStore(output_dir)
+        fov = SEARCH_CONFIG["sv_fov"]
+        size = SEARCH_CONFIG["sv_size"]
+        counters = {"downloaded": 0, "failed": 0, "skipped": 0}
+        lock = threading.Lock()
+        
+        def reserve() -> bool:
+            with lock:
+                if max_downloads is not None and counters["downloaded"] >= max_downloads:
+                    counters["skipped"] += 1
+                    return False
+                counters["downloaded"] += 1
+                return True
+        
+        def fetch(row) -> str:
+            pano_id = row.get("pano_id")
+            if not isinstance(pano_id, str):
+                pano_id = None
+            lat, lon, heading = row["lat"], row["lon"], row["heading"]
+            filename = store.relpath(pano_id, heading, fov, size, lat=lat, lon=lon)
+            filepath = store.resolve(filename)
+            if filepath.exists():
+                return filename
+            
+            if not reserve():
+                return row["filename"]
+            
+            self.download_rate_limiter.acquire()
+            url = self._sv_static_url(lat, lon, heading, pano_id=pano_id, size=size)
+            filepath.parent.mkdir(exist_ok=True)
+            
+            try:
+                self._stream_to_file(url, filepath)
+            except requests.RequestException as e:
+                logger.error(f"Erro ao baixar {filename}: {e}")
+                with lock:
+                    counters["downloaded"] -= 1
+                    counters["failed"] += 1
+                return row["filename"]
+            
+            return filename
+        
+        with ThreadPoolExecutor(max_workers=SEARCH_CONFIG["download_workers"]) as pool:
+            full_names = list(pool.map(fetch, sv_metadata.to_dict("records")))
+        
+        full = sv_metadata.copy()
+        full["thumb_filename"] = full["filename"]
+        full["filename"] = full_names
+        
+        self.download_stats["full_size"] = counters["downloaded"]
+        self.download_stats["downloaded"] = (
+            self.download_stats.get("downloaded", 0) + counters["downloaded"]
+        )
+        
+        logger.info(
+            f"Resolução cheia ({size}): {counters['downloaded']} baixadas, "
+            f"{len(full) - counters['downloaded'] - counters['failed'] - counters['skipped']} já no store, "
+            f"{counters['failed']} falhas, {counters['skipped']} fora do limite (mantida a miniatura)"
+        )
+        return full
+    
+    def _sv_row(
+        self,
+        i: int,
+        cand: Dict,
+        lat: float,
+        lon: float,
+        heading: int,
+        filename: str
+    ) -> Dict:
+        """
+        Linha de metadados de uma imagem Street View.
+        """
+        return {
+            "candidate_idx": i,
+            "lat": lat,
+            "lon": lon,
+            "heading": heading,
+            "filename": filename,
+            "source": cand.get("source"),
+            "sources": ",".join(filter(None, cand.get("sources", []))),
+            "pano_id": cand.get("sv_pano_id"),
+            "name": cand.get("name", ""),
+            "address": cand.get("address", "")
+        }
+    
+    def _stream_to_file(self, url: str, filepath: Path):
+        """
+        Baixa o corpo da resposta em streaming para um arquivo temporário
+        e renomeia ao final (nunca deixa arquivo parcial no destino).
+        """
+        tmp_path = filepath.with_name(filepath.name + ".part")
+        
+        try:
+            with self.session.get(url, stream=True, timeout=30) as r:
+                r.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+            os.replace(tmp_path, filepath)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+    
+    def _sv_static_url(
+        self,
+        lat: float,
+        lon: float,
+        heading: int,
+        pano_id: str = None,
+        size: str = None
+    ) -> str:
         """
         Gera URL do Street View Static API
+        
+        Com pano_id a imagem é pedida pelo panorama exato (e não pela
+        localização), garantindo que corresponde à chave do image store.
         """
         params = {
-            "size": SEARCH_CONFIG["sv_size"],
-            "location": f"{lat},{lon}",
+            "size": size or SEARCH_CONFIG["sv_size"],
             "heading": heading,
             "fov": SEARCH_CONFIG["sv_fov"],
             "pitch": 0,
             "key": self.api_key
         }
-        return "https://maps.googleapis.com/maps/api/streetview?" + urlencode(params)
+        if pano_id:
+            params["pano"] = pano_id
+        else:
+            params["location"] = f"{lat},{lon}"
+        return self.sv_static_url + "?" + urlencode(params)
 
 
 if __name__ == "__main__":
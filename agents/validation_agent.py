@@ -10,7 +10,8 @@ from pathlib import Path
 from openai import OpenAI
 import pandas as pd
 
-from config import LLM_CONFIG, PROMPTS, OPENAI_API_KEY, ML_CONFIG
+from config import LLM_CONFIG, PROMPTS, OPENAI_API_KEY, ML_CONFIG, API_CONFIG
+from .image_store import StreetViewImageStore
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,7 @@ class ValidationAgent:
         if not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY não configurada")
         
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = OpenAI(api_key=OPENAI_API_KEY, base_url=API_CONFIG["openai_base_url"])
         self.model = LLM_CONFIG["validation_model"]
         
         logger.info("ValidationAgent inicializado")
@@ -44,7 +45,7 @@ class ValidationAgent:
         Args:
             query_analysis: Análise visual da foto do usuário
             candidates_df: DataFrame com candidatos (filename, lat, lon, scores)
-            sv_dir: Diretório com imagens Street View
+            sv_dir: Raiz do image store com as imagens Street View
             
         Returns:
             DataFrame com validação LLM adicionada
@@ -52,9 +53,10 @@ class ValidationAgent:
         logger.info(f"Validando {len(candidates_df)} candidatos com LLM")
         
         results = []
+        store = StreetViewImageStore(sv_dir)
         
         for _, row in candidates_df.iterrows():
-            sv_path = sv_dir / row["filename"]
+            sv_path = store.resolve(row["filename"])
             
             # Analisar imagem SV
             from agents.vision_agent import VisionAgent
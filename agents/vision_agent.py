@@ -12,7 +12,7 @@ from openai import OpenAI
 from PIL import Image
 import io
 
-from config import LLM_CONFIG, PROMPTS, OPENAI_API_KEY
+from config import LLM_CONFIG, PROMPTS, OPENAI_API_KEY, API_CONFIG
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +27,7 @@ class VisionAgent:
         if not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY não configurada. Crie arquivo .env")
         
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = OpenAI(api_key=OPENAI_API_KEY, base_url=API_CONFIG["openai_base_url"])
         self.model = LLM_CONFIG["vision_model"]
         logger.info(f"VisionAgent inicializado com modelo {self.model}")
     
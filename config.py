@@ -51,29 +51,98 @@ def get_api_key(key_name, alternative_names=None):
 GOOGLE_KEY = get_api_key("GOOGLE_KEY")
 OPENAI_API_KEY = get_api_key("OPENAI_API_KEY")
 
+# Endpoints das APIs externas. MOCK_API_URL aponta tudo para o servidor
+# simulado local (python mock_server.py), sem gastar cota
+MOCK_API_URL = os.getenv("MOCK_API_URL", "").rstrip("/")
+API_CONFIG = {
+    "maps_base_url": MOCK_API_URL
+        or os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com"),
+    "places_base_url": MOCK_API_URL
+        or os.getenv("GOOGLE_PLACES_BASE_URL", "https://places.googleapis.com"),
+    "openai_base_url": f"{MOCK_API_URL}/v1" if MOCK_API_URL
+        else (os.getenv("OPENAI_BASE_URL") or None),  # None = padrão do SDK
+}
+
+# O servidor simulado aceita qualquer chave
+if MOCK_API_URL:
+    GOOGLE_KEY = GOOGLE_KEY or "mock"
+    OPENAI_API_KEY = OPENAI_API_KEY or "mock"
+
 # Configurações de busca
 SEARCH_CONFIG = {
     # Área de busca inicial
     "default_city": "São Paulo",
     "default_state": "SP",
     
+    # Gazetteers locais (tabelas | Bairro | Latitude | Longitude |)
+    # resolvem bairros conhecidos sem chamar a Geocoding API
+    "gazetteers": [
+        {"file": BASE_DIR / "COORDENADAS_BAIRROS_SP.md", "city": "São Paulo", "state": "SP"},
+    ],
+    
     # Estratégia de busca
     "search_strategy": "funnel",  # funnel (macro→micro) ou grid (grade)
     "initial_radius_m": 3000,     # ⬆️ AUMENTADO: raio inicial
     "grid_spacing_m": 40,         # ⬇️ REDUZIDO: mais pontos na grade
+    "grid_layout": "square",      # square (quadrada) ou hex (hexagonal)
+    
+    # Amostragem ao longo das ruas (extrato OSM local .geojson ou .pbf)
+    # Se configurado, substitui a grade regular no search_area/refine_search
+    "osm_extract_path": os.getenv("OSM_EXTRACT_PATH") or None,
+    "osm_highway_types": [
+        "residential", "living_street", "unclassified", "tertiary", "secondary",
+    ],
     "refinement_radius_m": 200,   # raio de refinamento após match
     "refinement_spacing_m": 20,   # espaçamento no refinamento
     
+    # Catálogo pré-varrido (precrawl.py): áreas cobertas dispensam a varredura da grade
+    "use_precrawl": True,
+    "precrawl_dir": DATA_DIR / "precrawl",
+    "precrawl_tile_m": 500,       # lado dos tiles (unidade de trabalho/shard/retomada)
+    
+    # Funil (search_strategy = "funnel"): grade grossa → CLIP → refinamento
+    "coarse_spacing_m": 160,      # espaçamento da grade grossa
+    "funnel_seed_hits": 20,       # melhores imagens da grade grossa usadas como sementes
+    "funnel_seed_min_clip": 0.30, # score CLIP mínimo de uma semente
+    "funnel_max_clusters": 5,     # clusters refinados (raio refinement_radius_m)
+    "coarse_budget_fraction": 0.6,  # fração de max_sv_downloads da grade grossa (resto: refinamento)
+    
     # Street View
     "sv_min_year": 2020,          # ⬇️ REDUZIDO: aceitar fotos mais antigas
     "sv_size": "640x640",
+    "two_pass_download": True,    # triagem CLIP em miniatura; resolução cheia só p/ aprovadas
+    "sv_thumb_size": "256x256",   # miniatura da triagem (o CLIP usa 224x224)
     "sv_fov": 90,
     "sv_headings": [0, 45, 90, 135, 180, 225, 270, 315],
+    "heading_mode": "facade",     # facade (perpendicular à rua) ou all (sv_headings)
+    "facade_diagonals": False,    # incluir diagonais (±45°) além das fachadas
+    "heading_neighbor_radius_m": 30,  # raio mínimo dos panos vizinhos para estimar a rua
+    "heading_neighbor_spacing_factor": 1.5,  # raio ≥ fator × espaçamento da amostragem
+    "heading_snap_min_m": 20,     # ponto da grade ≥ N m do pano: rua ⟂ ao vetor pano→ponto
+    "places_target_views": 2,     # imagens mirando o local de resultados do Places (1, 2; 0 = desligado)
+    "metadata_cache_decimals": 5, # quantização lat/lon da chave do cache (~1m)
+    "pano_index": True,           # índice espacial local de panos conhecidos
+    "pano_index_tolerance_m": 10, # ponto "coberto" se há pano/consulta a até N metros
+    "pano_index_cell_m": 100,     # tamanho da célula do hash espacial
     
     # Limites
     "max_sv_downloads": 800,      # ⬆️ AUMENTADO: mais downloads
+    "resume_journal": True,       # journal JSONL para retomar execuções interrompidas
+    "priority_sectors": 8,        # setores angulares da estratificação dos downloads
+    "priority_ring_m": 500,       # largura dos anéis da estratificação
+    "priority_hint_radius_m": 150,  # pontos perto de um Places que bate com as dicas sobem de prioridade
     "max_places_results": 150,    # ⬆️ AUMENTADO: mais resultados
-    "request_delay": 0.1,  # delay entre requisições (segundos)
+    
+    # Concorrência / rate limiting (Street View Metadata)
+    "metadata_workers": 16,       # threads consultando metadata em paralelo
+    "metadata_queue_factor": 4,   # consultas em voo ≤ fator × metadata_workers
+    "requests_per_second": 25,    # taxa máxima global (token bucket)
+    "max_retries": 4,             # tentativas em 429 / OVER_QUERY_LIMIT
+    "backoff_base_s": 1.0,        # pausa inicial do backoff exponencial
+    
+    # Concorrência (downloads Street View Static)
+    "download_workers": 16,       # downloads simultâneos
+    "downloads_per_second": 50,   # taxa máxima global de downloads
 }
 
 # Configurações de ML
@@ -82,6 +151,26 @@ ML_CONFIG = {
     "clip_model": "ViT-bigG-14",
     "clip_pretrained": "laion2b_s39b_b160k",
     "clip_threshold": 0.50,  # ⬇️ REDUZIDO: threshold mínimo para considerar match
+    "clip_batch_size": 32,  # imagens por lote na inferência CLIP
+    "clip_preprocess_workers": 8,  # threads decodificando/redimensionando imagens
+    
+    # Backend da torre de imagem: "torch" (original), "onnx" (int8) ou
+    # "torchscript" (bf16); os dois últimos vêm de export_clip.py (CPU)
+    "clip_backend": "torch",
+    "clip_export_dir": DATA_DIR / "clip_export",
+    
+    # Cascata: CLIP pequeno tria todos os candidatos, o clip_model só
+    # re-pontua o topo (ver MatchingAgent.evaluate_cascade)
+    "cascade_enabled": False,  # troca recall por tempo: ligar só após medir com evaluate_cascade
+    "screen_model": "ViT-B-32",
+    "screen_pretrained": "laion2b_s34b_b79k",
+    "screen_keep_fraction": 0.2,  # fração que segue para o clip_model
+    "screen_min_keep": 50,  # nunca menos que isso
+    
+    # Índice ANN por região (bairros pré-varridos, ver precrawl.py --regiao)
+    "ann_dir": DATA_DIR / "ann",
+    "ann_nprobe": 16,  # listas visitadas por consulta (↑ = mais recall, mais lento)
+    "ann_min_train": 1024,  # abaixo disso a busca é exata
     
     # SIFT (geometria)
     "sift_features": 4000,
@@ -97,6 +186,7 @@ ML_CONFIG = {
     # Validação final
     "min_confidence": 0.70,  # ⬇️ REDUZIDO: confiança mínima para retornar resultado
     "top_k_candidates": 30,  # ⬆️ AUMENTADO: mais candidatos para validação LLM
+    "geom_pool_factor": 3,  # SIFT nos top_k × fator por CLIP; top_k final pelo score combinado
 }
 
 # Configurações do LLM
@@ -213,6 +303,7 @@ CACHE_CONFIG = {
     "cache_embeddings": True,  # cachear embeddings CLIP
     "cache_street_view": True,  # cachear downloads SV
     "cache_places": True,       # cachear buscas Places
+    "cache_geocoding": True,    # cachear geocodificações
     "ttl_days": 30,             # tempo de vida do cache
 }
 
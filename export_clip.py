@@ -0,0 +1,256 @@
+"""
+Exportação da torre de imagem CLIP para inferência em CPU
+Gera, para cada modelo configurado (clip_model e, com a cascata,
+screen_model), artefatos otimizados que o MatchingAgent carrega com
+ML_CONFIG["clip_backend"]:
+
+    onnx         ONNX com quantização dinâmica int8 (ONNX Runtime)
+    torchscript  TorchScript congelado em bf16
+
+Cada artefato passa por uma checagem de paridade contra o modelo fp32
+(cosseno por imagem e desvio das similaridades entre imagens); o
+resultado vai para export.json ao lado dos artefatos.
+
+Uso:
+    python export_clip.py
+    python export_clip.py --formato onnx --imagens output/street_views --amostras 128
+    python export_clip.py --modelo ViT-B-32 --pretrained laion2b_s34b_b79k
+"""
+
+import argparse
+import copy
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import torch
+import open_clip
+from PIL import Image
+
+from config import OUTPUT_DIR, ML_CONFIG, LOGGING_CONFIG
+from agents.matching_agent import export_dir
+
+logging.basicConfig(level=LOGGING_CONFIG["level"], format=LOGGING_CONFIG["format"])
+logger = logging.getLogger("export_clip")
+
+ONNX_FILE = "visual.int8.onnx"
+TORCHSCRIPT_FILE = "visual.bf16.pt"
+
+
+def carregar_amostras(pasta: Path, n: int, preprocess, image_size: List[int]) -> torch.Tensor:
+    """
+    Lote de imagens reais para a checagem de paridade (ruído se não houver).
+    """
+    paths = sorted(pasta.rglob("*.jpg"))[:n] if pasta.exists() else []
+    if not paths:
+        logger.warning(f"Nenhuma imagem em {pasta}; paridade medida com ruído (menos representativo)")
+        return torch.randn(n, 3, *image_size)
+    return torch.stack([preprocess(Image.open(p).convert("RGB")) for p in paths])
+
+
+def _image_size(visual: torch.nn.Module) -> List[int]:
+    size = visual.image_size
+    return [size, size] if isinstance(size, int) else list(size)
+
+
+def _normalize(emb: np.ndarray) -> np.ndarray:
+    return emb / np.linalg.norm(emb, axis=-1, keepdims=True)
+
+
+def paridade(ref: np.ndarray, emb: np.ndarray, min_cos: float, k: int = 10) -> Dict:
+    """
+    Desvio do artefato em relação ao fp32 (embeddings já normalizados):
+    cosseno por imagem, maior desvio nas similaridades imagem×imagem e
+    sobreposição dos top-k vizinhos de cada imagem.
+    """
+    cos = np.sum(ref * emb, axis=1)
+    sim_ref, sim_emb = ref @ ref.T, emb @ emb.T
+
+    k = min(k, len(ref) - 1)
+    overlap = 1.0
+    if k > 0:
+        np.fill_diagonal(sim_ref, -np.inf)
+        np.fill_diagonal(sim_emb, -np.inf)
+        top_ref = np.argsort(-sim_ref, axis=1)[:, :k]
+        top_emb = np.argsort(-sim_emb, axis=1)[:, :k]
+        overlap = float(np.mean([
+            len(set(a) & set(b)) / k for a, b in zip(top_ref.tolist(), top_emb.tolist())
+        ]))
+        np.fill_diagonal(sim_ref, 1.0)
+        np.fill_diagonal(sim_emb, 1.0)
+
+    return {
+        "amostras": len(ref),
+        "cos_medio": float(cos.mean()),
+        "cos_min": float(cos.min()),
+        "desvio_similaridade_max": float(np.abs(sim_ref - sim_emb).max()),
+        f"top{k}_overlap": overlap,
+        "aprovado": bool(cos.min() >= min_cos)
+    }
+
+
+def exportar_onnx(visual: torch.nn.Module, exemplo: torch.Tensor, destino: Path):
+    """
+    Exporta em fp32 e aplica quantização dinâmica int8 (pesos dos Linear).
+    O fp32 intermediário (com os arquivos de dados externos que o exportador
+    cria para modelos grandes) fica num diretório temporário.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    grande = sum(p.numel() for p in visual.parameters()) * 4 > 2 ** 31  # limite do protobuf
+    tmp_dir = Path(tempfile.mkdtemp(prefix="clip_onnx_", dir=destino))
+    try:
+        fp32_path = tmp_dir / "visual.fp32.onnx"
+        torch.onnx.export(
+            visual,
+            exemplo[:1],
+            str(fp32_path),
+            input_names=["image"],
+            output_names=["embedding"],
+            dynamic_axes={"image": {0: "batch"}, "embedding": {0: "batch"}},
+            opset_version=17
+        )
+        quantize_dynamic(
+            str(fp32_path),
+            str(destino / ONNX_FILE),
+            weight_type=QuantType.QInt8,
+            use_external_data_format=grande
+        )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def carregar_onnx(path: Path):
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+    return lambda x: session.run(None, {"image": x.numpy()})[0]
+
+
+def exportar_torchscript(visual: torch.nn.Module, exemplo: torch.Tensor, destino: Path):
+    visual_bf16 = copy.deepcopy(visual).to(torch.bfloat16).eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(visual_bf16, exemplo[:1].to(torch.bfloat16))
+        traced = torch.jit.freeze(traced)
+    traced.save(str(destino / TORCHSCRIPT_FILE))
+
+
+def carregar_torchscript(path: Path):
+    model = torch.jit.load(str(path), map_location="cpu")
+
+    def rodar(x: torch.Tensor) -> np.ndarray:
+        with torch.no_grad():
+            return model(x.to(torch.bfloat16)).float().numpy()
+    return rodar
+
+
+FORMATOS = {
+    "onnx": (ONNX_FILE, exportar_onnx, carregar_onnx),
+    "torchscript": (TORCHSCRIPT_FILE, exportar_torchscript, carregar_torchscript),
+}
+
+
+def _medir(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def exportar_modelo(model_name: str, pretrained: str, formatos: List[str], args) -> bool:
+    """
+    Exporta um modelo nos formatos pedidos e grava export.json.
+
+    Returns:
+        True se todos os artefatos passaram na checagem de paridade
+    """
+    destino = export_dir(model_name, pretrained)
+    destino.mkdir(exist_ok=True, parents=True)
+
+    logger.info(f"Carregando {model_name} ({pretrained}) em fp32...")
+    model, _, preprocess = open_clip.create_model_and_transforms(
+        model_name, pretrained=pretrained, device="cpu"
+    )
+    model.eval()
+    visual = model.visual
+
+    amostras = carregar_amostras(Path(args.imagens), args.amostras, preprocess, _image_size(visual))
+    with torch.no_grad():
+        ref, t_ref = _medir(lambda x: visual(x).numpy(), amostras)
+    ref = _normalize(ref)
+
+    info_path = destino / "export.json"
+    info = json.loads(info_path.read_text()) if info_path.exists() else {"artifacts": {}}
+    info.update({
+        "model": model_name,
+        "pretrained": pretrained,
+        "dim": int(visual.output_dim),
+        "image_size": _image_size(visual),
+        "mean": list(getattr(visual, "image_mean", None) or open_clip.OPENAI_DATASET_MEAN),
+        "std": list(getattr(visual, "image_std", None) or open_clip.OPENAI_DATASET_STD),
+    })
+
+    ok = True
+    for formato in formatos:
+        arquivo, exportar, carregar = FORMATOS[formato]
+        logger.info(f"Exportando {model_name} → {formato}...")
+        exportar(visual, amostras, destino)
+
+        emb, t_art = _medir(carregar(destino / arquivo), amostras)
+        parity = paridade(ref, _normalize(emb), args.min_cos)
+        parity["img_s_fp32"] = len(amostras) / t_ref
+        parity[f"img_s_{formato}"] = len(amostras) / t_art
+
+        info["artifacts"][formato] = {"file": arquivo, "parity": parity}
+        ok &= parity["aprovado"]
+
+        status = "✅" if parity["aprovado"] else "❌"
+        logger.info(
+            f"{status} {formato}: cos médio {parity['cos_medio']:.4f}, mínimo {parity['cos_min']:.4f}, "
+            f"desvio máx. de similaridade {parity['desvio_similaridade_max']:.4f}, "
+            f"{parity['img_s_fp32']:.1f} → {parity[f'img_s_{formato}']:.1f} img/s"
+        )
+
+    info_path.write_text(json.dumps(info, indent=2, ensure_ascii=False))
+    logger.info(f"Artefatos em {destino}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta a torre de imagem CLIP para CPU")
+    parser.add_argument("--formato", choices=["onnx", "torchscript", "todos"], default="todos")
+    parser.add_argument("--modelo", help="Modelo OpenCLIP (padrão: clip_model e screen_model)")
+    parser.add_argument("--pretrained", help="Pesos do modelo (obrigatório com --modelo)")
+    parser.add_argument(
+        "--imagens", default=str(OUTPUT_DIR / "street_views"),
+        help="Pasta com imagens para a checagem de paridade"
+    )
+    parser.add_argument("--amostras", type=int, default=64, help="Imagens na checagem de paridade")
+    parser.add_argument("--min-cos", type=float, default=0.99, help="Cosseno mínimo aceito por imagem")
+
+    args = parser.parse_args()
+    formatos = list(FORMATOS) if args.formato == "todos" else [args.formato]
+
+    if args.modelo:
+        if not args.pretrained:
+            parser.error("--pretrained é obrigatório com --modelo")
+        modelos = [(args.modelo, args.pretrained)]
+    else:
+        modelos = [(ML_CONFIG["clip_model"], ML_CONFIG["clip_pretrained"])]
+        if ML_CONFIG["cascade_enabled"]:
+            modelos.append((ML_CONFIG["screen_model"], ML_CONFIG["screen_pretrained"]))
+
+    ok = all([exportar_modelo(nome, pesos, formatos, args) for nome, pesos in modelos])
+    if not ok:
+        logger.error("Algum artefato ficou abaixo de --min-cos (ver export.json)")
+        sys.exit(1)
+
+    logger.info(f"Para usar: ML_CONFIG['clip_backend'] = '{formatos[0]}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ Orquestra todos os agentes para encontrar o endereço do imóvel
 import logging
 import json
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
 import folium
 
@@ -19,6 +19,9 @@ from agents.vision_agent import VisionAgent
 from agents.search_agent import SearchAgent
 from agents.matching_agent import MatchingAgent
 from agents.validation_agent import ValidationAgent
+from agents.geocoder import Geocoder
+from agents.geo_utils import cluster_points
+from agents.image_store import StreetViewImageStore
 
 
 # Configurar logging
@@ -55,11 +58,15 @@ class GeoLocalizador:
         self.search_agent = SearchAgent()
         self.matching_agent = MatchingAgent()
         self.validation_agent = ValidationAgent()
+        self.geocoder = Geocoder()
         
         # Diretórios de saída
         self.sv_dir = OUTPUT_DIR / "street_views"
         self.sv_dir.mkdir(exist_ok=True, parents=True)
         
+        # Estado da busca incremental (anéis de raio crescente)
+        self._busca_incremental = None
+        
         logger.info("✅ Todos os agentes inicializados")
     
     def localizar_imovel(
@@ -69,7 +76,8 @@ class GeoLocalizador:
         bairro: str = None,
         center_lat: float = None,
         center_lon: float = None,
-        radius_m: int = None
+        radius_m: int = None,
+        incremental: bool = False
     ) -> Dict:
         """
         Localiza o imóvel e retorna endereço completo.
@@ -80,6 +88,9 @@ class GeoLocalizador:
             bairro: Bairro (ex: "Alto da Boa Vista")
             center_lat/lon: Coordenadas iniciais (opcional)
             radius_m: Raio de busca (opcional)
+            incremental: Reaproveitar a chamada anterior (mesma foto e centro,
+                raio menor): só o anel novo é varrido, e downloads, scores
+                CLIP/SIFT e validações já feitos são mesclados
             
         Returns:
             Dict com endereço, coordenadas, confiança, etc.
@@ -93,9 +104,26 @@ class GeoLocalizador:
         logger.info(f"LOCALIZANDO IMÓVEL: {foto_path.name}")
         logger.info(f"{'='*60}\n")
         
+        # Usar coordenadas fornecidas ou padrão
+        if center_lat is None or center_lon is None:
+            center_lat = SEARCH_CONFIG.get("initial_lat", -23.6505)
+            center_lon = SEARCH_CONFIG.get("initial_lon", -46.6815)
+            logger.warning(f"Usando coordenadas padrão: ({center_lat}, {center_lon})")
+        
+        cidade = cidade or SEARCH_CONFIG["default_city"]
+        radius_m = radius_m or SEARCH_CONFIG["initial_radius_m"]
+        
+        estado = self._estado_incremental(
+            foto_path, center_lat, center_lon, radius_m
+        ) if incremental else None
+        
         # === ETAPA 1: Análise Visual ===
         logger.info("🔍 ETAPA 1: Análise Visual")
-        query_analysis = self.vision_agent.analyze_image(foto_path)
+        if estado is not None:
+            query_analysis = estado["query_analysis"]
+            logger.info("♻️  Reutilizando análise visual da busca anterior")
+        else:
+            query_analysis = self.vision_agent.analyze_image(foto_path)
         
         if not query_analysis["success"]:
             return {
@@ -116,13 +144,20 @@ class GeoLocalizador:
         # === ETAPA 2: Busca Geográfica ===
         logger.info("\n🗺️  ETAPA 2: Busca Geográfica")
         
-        # Usar coordenadas fornecidas ou padrão
-        if center_lat is None or center_lon is None:
-            center_lat = SEARCH_CONFIG.get("initial_lat", -23.6505)
-            center_lon = SEARCH_CONFIG.get("initial_lon", -46.6815)
-            logger.warning(f"Usando coordenadas padrão: ({center_lat}, {center_lon})")
+        inner_radius_m = estado["radius_m"] if estado else 0
+        if inner_radius_m:
+            logger.info(f"🔁 Busca incremental: anel {inner_radius_m}m → {radius_m}m")
         
-        cidade = cidade or SEARCH_CONFIG["default_city"]
+        # Funil: grade grossa primeiro, densificação só onde o CLIP apontar
+        funil = SEARCH_CONFIG["search_strategy"] == "funnel"
+        spacing_m = SEARCH_CONFIG["coarse_spacing_m"] if funil else SEARCH_CONFIG["grid_spacing_m"]
+        
+        # Journal da execução: se esta mesma busca foi interrompida,
+        # metadados e downloads já concluídos não são refeitos
+        self.search_agent.start_journal(
+            f"{foto_path.resolve()}|{center_lat:.6f},{center_lon:.6f}|"
+            f"{inner_radius_m}-{radius_m}|{SEARCH_CONFIG['search_strategy']}|{spacing_m}"
+        )
         
         candidates = self.search_agent.search_area(
             center_lat=center_lat,
@@ -130,10 +165,14 @@ class GeoLocalizador:
             radius_m=radius_m,
             city=cidade,
             neighborhood=bairro,
-            text_hints=text_hints
+            text_hints=text_hints,
+            inner_radius_m=inner_radius_m,
+            exclude_pano_ids=estado["pano_ids"] if estado else None,
+            spacing_m=spacing_m
         )
         
-        if not candidates:
+        if not candidates and estado is None:
+            self.search_agent.finish_journal()
             return {
                 "success": False,
                 "error": "Nenhum candidato encontrado na área",
@@ -145,9 +184,49 @@ class GeoLocalizador:
         # === ETAPA 3: Download Street Views ===
         logger.info("\n📸 ETAPA 3: Download Street Views")
         
-        sv_metadata = self.search_agent.download_street_views(
+        # Orçamento de downloads compartilhado entre os anéis
+        max_downloads = SEARCH_CONFIG["max_sv_downloads"] - (estado["downloads"] if estado else 0)
+        
+        # Duas passadas: a resolução cheia do top-K sai do mesmo orçamento
+        full_size_reserve = (
+            min(ML_CONFIG["top_k_candidates"], max(max_downloads, 0))
+            if SEARCH_CONFIG["two_pass_download"] else 0
+        )
+        first_pass_downloads = max_downloads - full_size_reserve
+        
+        # No funil, parte do orçamento fica reservada para o refinamento
+        # (a grade grossa sozinha pode pedir milhares de imagens)
+        coarse_downloads = (
+            int(first_pass_downloads * SEARCH_CONFIG["coarse_budget_fraction"])
+            if funil else first_pass_downloads
+        )
+        
+        new_sv_metadata = self.search_agent.download_street_views(
             candidates,
-            self.sv_dir
+            self.sv_dir,
+            max_downloads=coarse_downloads,
+            center=(center_lat, center_lon),
+            text_hints=text_hints
+        ) if candidates else pd.DataFrame()
+        
+        # Embeddings já calculados pelo precrawl.py (área pré-varrida)
+        self._embeddings_do_catalogo(new_sv_metadata)
+        
+        # Scores CLIP das imagens novas (preenchido pelo funil)
+        new_scores = None
+        if funil and len(new_sv_metadata) > 0:
+            logger.info("\n🔬 ETAPA 3b: Funil (CLIP na grade grossa → refinamento)")
+            candidates, new_sv_metadata, new_scores = self._refinar_funil(
+                foto_path,
+                candidates,
+                new_sv_metadata,
+                excluded_pano_ids=estado["pano_ids"] if estado else set(),
+                max_downloads=first_pass_downloads
+            )
+        
+        sv_metadata = pd.concat(
+            [estado["sv_metadata"], new_sv_metadata] if estado else [new_sv_metadata],
+            ignore_index=True
         )
         
         sv_metadata.to_csv(OUTPUT_DIR / "sv_metadata.csv", index=False)
@@ -156,11 +235,62 @@ class GeoLocalizador:
         # === ETAPA 4: Matching Visual ===
         logger.info("\n🎯 ETAPA 4: Matching Visual (CLIP + SIFT)")
         
-        top_matches = self.matching_agent.rank_candidates(
-            foto_path,
-            sv_metadata,
-            self.sv_dir
-        )
+        # Só as imagens novas são pontuadas; o top-K da união é o top-K
+        # dos top-Ks parciais
+        ranked = [estado["top_matches"]] if estado else []
+        if new_scores is None and len(new_sv_metadata) > 0:
+            new_scores = self.matching_agent.rank_candidates(
+                foto_path,
+                new_sv_metadata,
+                self.sv_dir,
+                compute_geometry=not SEARCH_CONFIG["two_pass_download"]
+            )
+        if new_scores is not None:
+            new_scores = new_scores[new_scores["clip_score"] >= ML_CONFIG["clip_threshold"]]
+            
+            # Duas passadas: CLIP viu miniaturas; SIFT (e depois o LLM) usam
+            # a resolução cheia, baixada só para os aprovados
+            if SEARCH_CONFIG["two_pass_download"] and len(new_scores) > 0:
+                new_scores = (
+                    new_scores.sort_values("combined_score", ascending=False)
+                    .head(ML_CONFIG["top_k_candidates"])
+                )
+                full = self.search_agent.fetch_full_size(
+                    new_scores,
+                    self.sv_dir,
+                    max_downloads=max_downloads - self.search_agent.download_stats.get("downloaded", 0)
+                )
+                new_scores = self.matching_agent.score_geometry(foto_path, full, self.sv_dir)
+            
+            ranked.append(new_scores)
+        top_matches = (
+            pd.concat(ranked, ignore_index=True)
+            .sort_values("combined_score", ascending=False)
+            .head(ML_CONFIG["top_k_candidates"])
+            .reset_index(drop=True)
+        ) if ranked else pd.DataFrame()
+        
+        # Downloads deste anel (grade + funil + resolução cheia), para o
+        # orçamento compartilhado
+        ring_downloads = self.search_agent.download_stats.get("downloaded", 0) if candidates else 0
+        
+        # Buscas e downloads concluídos: o journal não é mais necessário
+        self.search_agent.finish_journal()
+        
+        if incremental:
+            self._busca_incremental = {
+                "foto": str(foto_path),
+                "center": (center_lat, center_lon),
+                "radius_m": radius_m,
+                "query_analysis": query_analysis,
+                "pano_ids": (estado["pano_ids"] if estado else set()) | {
+                    c["sv_pano_id"] for c in candidates if c.get("sv_pano_id")
+                },
+                "downloads": (estado["downloads"] if estado else 0) + ring_downloads,
+                "sv_metadata": sv_metadata,
+                "top_matches": top_matches,
+                "validated": estado["validated"] if estado else pd.DataFrame()
+            }
         
         top_matches.to_csv(OUTPUT_DIR / "candidatos.csv", index=False)
         logger.info(f"✅ {len(top_matches)} candidatos ranqueados")
@@ -175,14 +305,34 @@ class GeoLocalizador:
         # === ETAPA 5: Validação LLM ===
         logger.info("\n🤖 ETAPA 5: Validação com Claude")
         
-        # Validar top K candidatos
+        # Validar top K candidatos (reaproveitando validações anteriores)
         top_k = min(5, len(top_matches))
-        validated = self.validation_agent.validate_candidates(
-            query_analysis,
-            top_matches.head(top_k),
-            self.sv_dir
+        to_validate = top_matches.head(top_k)
+        already = estado["validated"] if estado is not None else pd.DataFrame()
+        if len(already) > 0:
+            reused = already[already["filename"].isin(to_validate["filename"])]
+            to_validate = to_validate[~to_validate["filename"].isin(already["filename"])]
+        else:
+            reused = already
+        
+        validated_parts = [reused]
+        if len(to_validate) > 0:
+            validated_parts.append(self.validation_agent.validate_candidates(
+                query_analysis,
+                to_validate,
+                self.sv_dir
+            ))
+        validated = (
+            pd.concat(validated_parts, ignore_index=True)
+            .sort_values("final_confidence", ascending=False)
+            .reset_index(drop=True)
         )
         
+        if incremental:
+            self._busca_incremental["validated"] = pd.concat(
+                [already, validated], ignore_index=True
+            ).drop_duplicates(subset="filename", keep="last")
+        
         validated.to_csv(OUTPUT_DIR / "candidatos_validados.csv", index=False)
         
         # === ETAPA 6: Seleção Final ===
@@ -251,6 +401,139 @@ class GeoLocalizador:
         
         return resultado
     
+    def _embeddings_do_catalogo(self, sv_metadata: pd.DataFrame):
+        """
+        Coloca no cache do encoder os embeddings CLIP que o precrawl.py já
+        calculou para essas imagens (procurando só nos tiles delas).
+        
+        O catálogo guarda embeddings do modelo fp32; com clip_backend onnx
+        ou torchscript eles não entram no cache do encoder.
+        """
+        catalog = self.search_agent.catalog
+        if catalog is None or len(sv_metadata) == 0 or ML_CONFIG["clip_backend"] != "torch":
+            return
+        
+        store = StreetViewImageStore(self.sv_dir)
+        tile_ids = sorted({
+            catalog.tile_id(lat, lon)
+            for lat, lon in zip(sv_metadata["lat"].tolist(), sv_metadata["lon"].tolist())
+        })
+        known = catalog.embeddings(
+            sv_metadata["filename"].tolist(), ML_CONFIG["clip_model"], tile_ids=tile_ids
+        )
+        self.matching_agent.embedding_cache.update({
+            str(store.resolve(fn)): emb for fn, emb in known.items()
+        })
+        if known:
+            logger.info(f"♻️  {len(known)} embeddings CLIP do catálogo pré-varrido")
+    
+    def _refinar_funil(
+        self,
+        foto_path: Path,
+        candidates: List[Dict],
+        sv_metadata: pd.DataFrame,
+        excluded_pano_ids: set,
+        max_downloads: int
+    ) -> Tuple[List[Dict], pd.DataFrame, pd.DataFrame]:
+        """
+        Etapas finas do funil a partir da grade grossa já baixada:
+        1. Pontua com CLIP todas as imagens da grade grossa
+        2. Agrupa os melhores hits (funnel_seed_hits) em clusters
+        3. refine_search (grade densa) só ao redor dos funnel_max_clusters
+           melhores clusters, sem repetir panos já vistos
+        4. Baixa e pontua as imagens do refinamento, com o orçamento que a
+           grade grossa não usou (ao menos 1 - coarse_budget_fraction)
+        
+        Returns:
+            (candidatos, metadados SV, scores) da união grossa + fina;
+            os scores não são filtrados pelo clip_threshold
+        """
+        # Só o topo de cada etapa importa (sementes e top-K final); o resto
+        # nem passa pelo modelo CLIP principal quando a cascata está ligada
+        top_k = max(ML_CONFIG["top_k_candidates"], SEARCH_CONFIG["funnel_seed_hits"])
+        coarse_scores = self.matching_agent.rank_candidates(
+            foto_path, sv_metadata, self.sv_dir,
+            top_k=top_k, min_clip=-1.0,
+            compute_geometry=not SEARCH_CONFIG["two_pass_download"]
+        )
+        coarse_downloads = self.search_agent.download_stats.get("downloaded", 0)
+        refine_budget = max_downloads - coarse_downloads
+        if refine_budget <= 0:
+            logger.warning("Funil: orçamento de downloads esgotado na grade grossa; sem refinamento")
+            return candidates, sv_metadata, coarse_scores
+        
+        seeds = coarse_scores.head(SEARCH_CONFIG["funnel_seed_hits"])
+        seeds = seeds[seeds["clip_score"] >= SEARCH_CONFIG["funnel_seed_min_clip"]]
+        clusters = cluster_points(
+            seeds["lat"].to_numpy(),
+            seeds["lon"].to_numpy(),
+            SEARCH_CONFIG["refinement_radius_m"],
+            weights=seeds["clip_score"].to_numpy()
+        )[:SEARCH_CONFIG["funnel_max_clusters"]]
+        logger.info(
+            f"Funil: {len(seeds)} hits da grade grossa → {len(clusters)} clusters para refinar"
+        )
+        
+        seen = set(excluded_pano_ids) | {
+            c["sv_pano_id"] for c in candidates if c.get("sv_pano_id")
+        }
+        refined = []
+        for lat, lon, n_hits in clusters:
+            logger.info(f"   Cluster ({lat:.6f}, {lon:.6f}) com {n_hits} hits")
+            new = self.search_agent.refine_search((lat, lon), exclude_pano_ids=seen)
+            seen |= {c["sv_pano_id"] for c in new if c.get("sv_pano_id")}
+            refined.extend(new)
+        
+        if not refined:
+            return candidates, sv_metadata, coarse_scores
+        
+        refined_sv = self.search_agent.download_street_views(
+            refined,
+            self.sv_dir,
+            max_downloads=refine_budget
+        )
+        # Total do funil (para o orçamento compartilhado da busca incremental)
+        self.search_agent.download_stats["downloaded"] += coarse_downloads
+        
+        if len(refined_sv) == 0:
+            return candidates + refined, sv_metadata, coarse_scores
+        
+        self._embeddings_do_catalogo(refined_sv)
+        refined_sv["candidate_idx"] += len(candidates)
+        refined_scores = self.matching_agent.rank_candidates(
+            foto_path, refined_sv, self.sv_dir,
+            top_k=top_k, min_clip=-1.0,
+            compute_geometry=not SEARCH_CONFIG["two_pass_download"]
+        )
+        
+        return (
+            candidates + refined,
+            pd.concat([sv_metadata, refined_sv], ignore_index=True),
+            pd.concat([coarse_scores, refined_scores], ignore_index=True)
+        )
+    
+    def _estado_incremental(
+        self,
+        foto_path: Path,
+        center_lat: float,
+        center_lon: float,
+        radius_m: int
+    ) -> Optional[Dict]:
+        """
+        Estado da busca anterior, se puder ser estendida para radius_m
+        (mesma foto, mesmo centro, raio anterior menor). Senão, None.
+        """
+        estado = self._busca_incremental
+        if (
+            estado is None
+            or estado["foto"] != str(foto_path)
+            or estado["center"] != (center_lat, center_lon)
+            or estado["radius_m"] >= radius_m
+        ):
+            self._busca_incremental = None
+            return None
+        return estado
+    
     def _generate_sv_link(self, lat: float, lon: float, heading: int) -> str:
         """Gera link do Google Maps Street View"""
         return (
@@ -551,14 +834,6 @@ def buscar_apenas_por_foto(
     
     # 3. Estratégia de busca progressiva
     # Construir endereço para geocodificação com fallback
-    import requests
-    from config import GOOGLE_KEY
-    
-    geocode_url = "https://maps.googleapis.com/maps/api/geocode/json"
-    center_lat = None
-    center_lon = None
-    local_usado = None
-    
     # Tentar múltiplas combinações
     tentativas = []
     
@@ -586,28 +861,11 @@ def buscar_apenas_por_foto(
     
     logger.info("   Estratégia: Busca ampla → Refinamento progressivo")
     
-    # Tentar geocodificar com fallback
-    for tentativa in tentativas:
-        logger.info(f"   Tentando: {tentativa}")
-        
-        params = {
-            "address": tentativa,
-            "key": GOOGLE_KEY,
-            "region": "br"  # Priorizar Brasil
-        }
-        
-        response = requests.get(geocode_url, params=params)
-        geocode_data = response.json()
-        
-        if geocode_data["status"] == "OK":
-            location = geocode_data["results"][0]["geometry"]["location"]
-            center_lat = location["lat"]
-            center_lon = location["lng"]
-            local_usado = tentativa
-            logger.info(f"   ✅ Geocodificado com sucesso!")
-            break
-        else:
-            logger.info(f"   ❌ Falhou: {geocode_data.get('status')}")
+    # Tentar geocodificar com fallback (gazetteer/cache antes da rede)
+    centro, local_usado = geo.geocoder.resolve_first(tentativas)
+    center_lat, center_lon = centro if centro else (None, None)
+    if centro:
+        logger.info(f"   ✅ Geocodificado com sucesso!")
     
     if center_lat is None or center_lon is None:
         return {
@@ -639,12 +897,14 @@ def buscar_apenas_por_foto(
         logger.info(f"\n🔄 Tentativa com raio de {radius_m}m...")
         
         try:
+            # Incremental: cada raio varre só o anel novo e mescla com os anteriores
             resultado = geo.localizar_imovel(
                 foto_path=foto_path,
                 cidade=cidade,
                 center_lat=center_lat,
                 center_lon=center_lon,
-                radius_m=radius_m
+                radius_m=radius_m,
+                incremental=True
             )
             
             if resultado["success"]:
@@ -0,0 +1,406 @@
+"""
+Servidor simulado das APIs externas (Google Maps + OpenAI)
+Serve panos, imagens, lugares e respostas de LLM sintéticos, determinísticos
+e com latência/erros configuráveis, para testes de carga e de desempenho
+reproduzíveis sem gastar cota.
+
+Endpoints:
+    GET  /maps/api/streetview/metadata   Street View Metadata
+    GET  /maps/api/streetview            Street View Static (JPEG sintético)
+    GET  /maps/api/geocode/json          Geocoding
+    POST /v1/places:searchText           Places API (New) Text Search
+    POST /v1/chat/completions            OpenAI Chat Completions
+    GET  /stats                          contagem de requisições por endpoint
+
+Uso:
+    python mock_server.py --port 8765 --latency-ms 80 --error-rate 0.01
+    MOCK_API_URL=http://127.0.0.1:8765 python main.py --foto casa.jpg --lat -23.65 --lon -46.68
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger("mock_server")
+
+# Malha de ruas sintética: ruas a cada STREET_M metros nos dois sentidos,
+# um pano a cada PANO_M metros ao longo delas
+STREET_M = 100
+PANO_M = 15
+COVERAGE_M = 25  # distância máxima de um ponto consultado até a rua
+
+# Centro de referência da malha (São Paulo)
+ORIGIN_LAT, ORIGIN_LON = -23.55, -46.63
+
+
+def deg_per_m(lat: float):
+    """
+    (graus de latitude, graus de longitude) por metro. Igual a
+    agents.geo_utils.deg_per_m, repetido aqui para o servidor não importar
+    o pacote agents (que carrega torch/CLIP).
+    """
+    return 1 / 111000, 1 / (111000 * np.cos(np.radians(lat)))
+
+
+def _seed(*parts) -> int:
+    return int(hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:8], 16)
+
+
+def snap_to_pano(lat: float, lon: float):
+    """
+    Pano mais próximo na malha sintética, ou None fora da cobertura.
+
+    Returns:
+        (pano_id, lat, lon) ou None
+    """
+    dlat, dlon = deg_per_m(ORIGIN_LAT)
+    x = (lon - ORIGIN_LON) / dlon
+    y = (lat - ORIGIN_LAT) / dlat
+
+    # Rua mais próxima: vertical (x fixo) ou horizontal (y fixo)
+    dx = abs(x - round(x / STREET_M) * STREET_M)
+    dy = abs(y - round(y / STREET_M) * STREET_M)
+    if min(dx, dy) > COVERAGE_M:
+        return None
+
+    if dx <= dy:
+        px, py = round(x / STREET_M) * STREET_M, round(y / PANO_M) * PANO_M
+    else:
+        px, py = round(x / PANO_M) * PANO_M, round(y / STREET_M) * STREET_M
+
+    pano_id = f"MOCK_{int(px)}_{int(py)}"
+    return pano_id, ORIGIN_LAT + py * dlat, ORIGIN_LON + px * dlon
+
+
+@lru_cache(maxsize=4096)
+def synthetic_jpeg(origin: str, heading: int, size: str) -> bytes:
+    """
+    Imagem determinística por (pano/local, heading): "fachadas" em blocos
+    de cor, para que CLIP e SIFT tenham algo estável para comparar.
+    """
+    w, h = (int(v) for v in size.split("x"))
+    rng = np.random.default_rng(_seed(origin, heading // 10))
+    img = np.empty((h, w, 3), dtype=np.uint8)
+    img[: h // 3] = rng.integers(150, 230, 3)  # céu
+    img[h // 3:] = rng.integers(40, 200, 3)  # fachada
+    for _ in range(12):  # janelas/portões
+        x0, y0 = rng.integers(0, w - w // 8), rng.integers(h // 3, h - h // 8)
+        img[y0:y0 + h // 10, x0:x0 + w // 12] = rng.integers(0, 255, 3)
+
+    buffer = io.BytesIO()
+    Image.fromarray(img).save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+# ----------------------------------------------------------------------
+# Respostas canônicas do LLM
+# ----------------------------------------------------------------------
+
+def _llm_visual_analysis(rng) -> dict:
+    return {
+        "architecture": {
+            "style": rng.choice(["moderno", "clássico", "contemporâneo"]),
+            "floors_visible": rng.randint(1, 3),
+            "roof_type": "laje",
+            "main_color": rng.choice(["branca", "bege", "cinza"]),
+            "material": "concreto"
+        },
+        "distinctive_features": {
+            "gate_type": "metal",
+            "windows": {"style": "vidro", "count_visible": rng.randint(2, 8)},
+            "balcony_garage": "sim",
+            "garden_plants": "não",
+            "unique_elements": ["muro alto"]
+        },
+        "urban_context": {
+            "street_type": "residencial",
+            "sidewalk": "estreita",
+            "trees_visible": "sim",
+            "utility_poles": "sim",
+            "adjacent_buildings": "casas similares",
+            "street_slope": "plana"
+        },
+        "visible_text": {
+            "address_number": "não visível",
+            "street_signs": [],
+            "condo_name": "não visível",
+            "other_text": []
+        },
+        "photography": {"angle": "frontal", "distance": "média", "quality": "boa"}
+    }
+
+
+def _llm_validation(rng) -> dict:
+    confidence = round(rng.uniform(0.3, 0.95), 2)
+    return {
+        "is_match": confidence >= 0.7,
+        "confidence": confidence,
+        "reasoning": "Resposta simulada (mock_server)",
+        "matching_elements": ["estilo", "cor"],
+        "discrepancies": [],
+        "likely_changes": []
+    }
+
+
+def _llm_address(rng) -> dict:
+    number = str(rng.randint(10, 2000))
+    return {
+        "street": "Rua Simulada",
+        "number": number,
+        "complement": "",
+        "neighborhood": "Bairro Simulado",
+        "city": "São Paulo",
+        "state": "SP",
+        "zip_code": "00000-000",
+        "full_address": f"Rua Simulada, {number} - Bairro Simulado, São Paulo - SP",
+        "confidence": 0.8,
+        "source": "visual+gps"
+    }
+
+
+def llm_reply(messages: list) -> str:
+    text = json.dumps(messages, ensure_ascii=False)
+    rng = random.Random(_seed(text))
+    if "Compare estas duas descrições" in text:
+        return json.dumps(_llm_validation(rng), ensure_ascii=False)
+    if "Determine o endereço" in text:
+        return json.dumps(_llm_address(rng), ensure_ascii=False)
+    return json.dumps(_llm_visual_analysis(rng), ensure_ascii=False)
+
+
+# ----------------------------------------------------------------------
+# Servidor
+# ----------------------------------------------------------------------
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Ajustados por make_server()
+    latency_s = 0.0
+    jitter_s = 0.0
+    error_rate = 0.0
+    quota_rate = 0.0
+
+    stats = Counter()
+    stats_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    # --- utilitários ---------------------------------------------------
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, data, status: int = 200):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def _simulate(self, endpoint: str) -> bool:
+        """
+        Latência + falhas injetadas. Retorna False se a resposta já foi enviada.
+        """
+        with self.stats_lock:
+            self.stats[endpoint] += 1
+
+        delay = self.latency_s + random.uniform(-self.jitter_s, self.jitter_s)
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = random.random()
+        if roll < self.quota_rate:
+            with self.stats_lock:
+                self.stats[f"{endpoint}:429"] += 1
+            self._json({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}, status=429)
+            return False
+        if roll < self.quota_rate + self.error_rate:
+            with self.stats_lock:
+                self.stats[f"{endpoint}:500"] += 1
+            self._json({"error": {"code": 500, "status": "INTERNAL"}}, status=500)
+            return False
+        return True
+
+    # --- GET -----------------------------------------------------------
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/stats":
+            with self.stats_lock:
+                return self._json(dict(self.stats))
+
+        if url.path == "/maps/api/streetview/metadata":
+            if self._simulate("sv_metadata"):
+                self._sv_metadata(query)
+        elif url.path == "/maps/api/streetview":
+            if self._simulate("sv_static"):
+                self._sv_static(query)
+        elif url.path == "/maps/api/geocode/json":
+            if self._simulate("geocode"):
+                self._geocode(query)
+        else:
+            self._json({"error": "not found"}, status=404)
+
+    def _sv_metadata(self, query: dict):
+        lat, lon = (float(v) for v in query.get("location", "0,0").split(","))
+        pano = snap_to_pano(lat, lon)
+        if pano is None:
+            return self._json({"status": "ZERO_RESULTS"})
+
+        pano_id, p_lat, p_lon = pano
+        year = 2018 + _seed(pano_id) % 7
+        self._json({
+            "status": "OK",
+            "pano_id": pano_id,
+            "date": f"{year}-{1 + _seed(pano_id, 'm') % 12:02d}",
+            "location": {"lat": p_lat, "lng": p_lon},
+            "copyright": "© mock_server"
+        })
+
+    def _sv_static(self, query: dict):
+        if "pano" in query:
+            origin = query["pano"]
+        else:
+            lat, lon = (float(v) for v in query.get("location", "0,0").split(","))
+            pano = snap_to_pano(lat, lon)
+            origin = pano[0] if pano else f"{lat:.5f},{lon:.5f}"
+
+        heading = int(float(query.get("heading", 0))) % 360
+        self._send(200, synthetic_jpeg(origin, heading, query.get("size", "640x640")), "image/jpeg")
+
+    def _geocode(self, query: dict):
+        address = query.get("address", "")
+        seed = _seed(address.lower())
+        if seed % 20 == 0:
+            return self._json({"status": "ZERO_RESULTS", "results": []})
+
+        dlat, dlon = deg_per_m(ORIGIN_LAT)
+        lat = ORIGIN_LAT + ((seed % 10000) / 10000 - 0.5) * 20000 * dlat
+        lon = ORIGIN_LON + ((seed // 10000 % 10000) / 10000 - 0.5) * 20000 * dlon
+        self._json({
+            "status": "OK",
+            "results": [{
+                "formatted_address": address,
+                "geometry": {"location": {"lat": lat, "lng": lon}}
+            }]
+        })
+
+    # --- POST ----------------------------------------------------------
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._json({"error": "invalid json"}, status=400)
+
+        if url.path == "/v1/places:searchText":
+            if self._simulate("places"):
+                self._places(body)
+        elif url.path == "/v1/chat/completions":
+            if self._simulate("openai_chat"):
+                self._chat(body)
+        else:
+            self._json({"error": "not found"}, status=404)
+
+    def _places(self, body: dict):
+        circle = body.get("locationBias", {}).get("circle", {})
+        center = circle.get("center", {})
+        lat0 = center.get("latitude", ORIGIN_LAT)
+        lon0 = center.get("longitude", ORIGIN_LON)
+        radius = circle.get("radius", 1000)
+
+        rng = random.Random(_seed(body.get("textQuery"), f"{lat0:.4f}", f"{lon0:.4f}"))
+        dlat, dlon = deg_per_m(lat0)
+        places = []
+        for k in range(rng.randint(0, min(20, body.get("maxResultCount", 20)))):
+            r = radius * rng.random() ** 0.5
+            theta = rng.uniform(0, 2 * np.pi)
+            places.append({
+                "id": f"mock_place_{_seed(body.get('textQuery'), k)}",
+                "displayName": {"text": f"Condomínio Simulado {k + 1}"},
+                "location": {
+                    "latitude": lat0 + r * np.cos(theta) * dlat,
+                    "longitude": lon0 + r * np.sin(theta) * dlon
+                },
+                "formattedAddress": f"Rua Simulada, {rng.randint(10, 2000)} - São Paulo - SP"
+            })
+        self._json({"places": places})
+
+    def _chat(self, body: dict):
+        content = llm_reply(body.get("messages", []))
+        self._json({
+            "id": f"chatcmpl-mock-{_seed(content)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    latency_ms: float = 0,
+    jitter_ms: float = 0,
+    error_rate: float = 0.0,
+    quota_rate: float = 0.0
+) -> ThreadingHTTPServer:
+    """
+    Cria o servidor (port=0 escolhe uma porta livre). Para rodar em
+    background num teste: threading.Thread(target=srv.serve_forever).
+    """
+    MockHandler.latency_s = latency_ms / 1000
+    MockHandler.jitter_s = jitter_ms / 1000
+    MockHandler.error_rate = error_rate
+    MockHandler.quota_rate = quota_rate
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor simulado Google Maps + OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latência média por requisição")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="Variação (±) da latência")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas HTTP 500")
+    parser.add_argument("--quota-rate", type=float, default=0.0, help="Fração de respostas HTTP 429")
+    parser.add_argument("--seed", type=int, default=0, help="Semente das falhas/latências")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    random.seed(args.seed)
+
+    server = make_server(
+        args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.quota_rate
+    )
+    logger.info(f"Servidor simulado em http://{args.host}:{server.server_port}")
+    logger.info(f"Use: MOCK_API_URL=http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,183 @@
+"""
+Pré-varredura offline de bairros
+Coleta metadados de panos, imagens de fachada e (opcionalmente) embeddings
+CLIP de um bairro ou polígono, tile a tile, num catálogo reutilizável em
+disco. Depois disso, localizar_imovel serve a área sem varrer a grade.
+
+Retomável (tiles concluídos têm marcador .done) e particionável entre
+workers (--shard i/n).
+
+Uso:
+    python precrawl.py --bairro "Santo Amaro" --raio 2000
+    python precrawl.py --poligono area.geojson --shard 0/4 --embeddings
+    python precrawl.py --bairro "Santo Amaro" --regiao santo-amaro
+"""
+
+import argparse
+import json
+import logging
+import sys
+import zlib
+from pathlib import Path
+from typing import List, Tuple
+
+from config import OUTPUT_DIR, SEARCH_CONFIG, ML_CONFIG, LOGGING_CONFIG
+from agents.search_agent import SearchAgent
+from agents.geocoder import Geocoder
+from agents.geo_utils import haversine_m
+from agents.image_store import StreetViewImageStore
+
+logging.basicConfig(level=LOGGING_CONFIG["level"], format=LOGGING_CONFIG["format"])
+logger = logging.getLogger("precrawl")
+
+
+def carregar_poligono(path: Path):
+    """
+    Polígono (ou união dos polígonos) de um arquivo GeoJSON.
+    """
+    from shapely.geometry import shape
+    from shapely.ops import unary_union
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    if data.get("type") == "FeatureCollection":
+        geoms = [shape(feat["geometry"]) for feat in data["features"]]
+    elif data.get("type") == "Feature":
+        geoms = [shape(data["geometry"])]
+    else:
+        geoms = [shape(data)]
+
+    return unary_union(geoms)
+
+
+def tiles_da_area(catalog, args) -> List[str]:
+    """
+    Tiles que tocam a área pedida (polígono ou círculo ao redor do bairro).
+
+    Cada tile é varrido por inteiro: o marcador .done vale para o tile
+    todo, e o catálogo pode servir qualquer busca que caia nele.
+    """
+    if args.poligono:
+        from shapely.geometry import box
+
+        poly = carregar_poligono(Path(args.poligono))
+        lon_min, lat_min, lon_max, lat_max = poly.bounds
+        return [
+            t for t in catalog.tiles_in_bbox(lat_min, lon_min, lat_max, lon_max)
+            if poly.intersects(box(*_lonlat_bounds(catalog, t)))
+        ]
+
+    coords, endereco = Geocoder().resolve_first([
+        f"{args.bairro}, {args.cidade}, {args.estado}",
+        f"{args.bairro}, {args.cidade}",
+    ])
+    if coords is None:
+        raise SystemExit(f"Não foi possível geocodificar o bairro '{args.bairro}'")
+
+    lat, lon = coords
+    logger.info(f"Bairro '{endereco}' → ({lat:.6f}, {lon:.6f}), raio {args.raio}m")
+    return catalog.tiles_for_disk(lat, lon, args.raio)
+
+
+def _lonlat_bounds(catalog, tile_id: str) -> Tuple[float, float, float, float]:
+    lat_min, lon_min, lat_max, lon_max = catalog.tile_bounds(tile_id)
+    return lon_min, lat_min, lon_max, lat_max
+
+
+def no_shard(tile_id: str, shard: int, n_shards: int) -> bool:
+    """
+    Partição estável dos tiles entre workers (crc32 do id).
+    """
+    return zlib.crc32(tile_id.encode("utf-8")) % n_shards == shard
+
+
+def varrer_tile(agent: SearchAgent, store_dir: Path, tile_id: str, matcher=None, regiao=None):
+    """
+    Amostra o tile, verifica Street View, baixa as fachadas e grava no
+    catálogo (e no índice ANN da região, se pedido).
+    """
+    catalog = agent.catalog
+    lat_min, lon_min, lat_max, lon_max = catalog.tile_bounds(tile_id)
+    c_lat, c_lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+    raio = float(haversine_m(c_lat, c_lon, lat_max, lon_max))
+
+    lats, lons, point_type = agent._sample_points(
+        c_lat, c_lon, raio, spacing=SEARCH_CONFIG["grid_spacing_m"]
+    )
+
+    # Só pontos do próprio tile (tiles vizinhos não se sobrepõem)
+    mask = (lats >= lat_min) & (lats < lat_max) & (lons >= lon_min) & (lons < lon_max)
+
+    candidates = [
+        {"lat": lat, "lon": lon, "source": "precrawl", "type": point_type}
+        for lat, lon in zip(lats[mask].tolist(), lons[mask].tolist())
+    ]
+    candidates = agent._dedupe_by_pano(agent._filter_by_street_view(candidates))
+
+    sv = agent.download_street_views(candidates, store_dir, max_downloads=sys.maxsize)
+
+    embeddings = {}
+    if matcher is not None and len(sv) > 0:
+        store = StreetViewImageStore(store_dir)
+        filenames = sv["filename"].tolist()
+        embs = matcher.embed_images([store.resolve(fn) for fn in filenames])
+        # O catálogo só guarda embeddings do modelo fp32 (ver GeoLocalizador)
+        if ML_CONFIG["clip_backend"] == "torch":
+            embeddings = dict(zip(filenames, embs))
+        if regiao:
+            matcher.index_region(regiao, sv, store_dir)
+        matcher.embedding_cache.clear()
+
+    catalog.write_tile(tile_id, candidates, embeddings, model=ML_CONFIG["clip_model"])
+    logger.info(
+        f"Tile {tile_id}: {len(candidates)} panos, {len(sv)} imagens, "
+        f"{len(embeddings)} embeddings"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-varredura offline de bairros")
+    area = parser.add_mutually_exclusive_group(required=True)
+    area.add_argument("--bairro", help="Bairro a varrer (geocodificado)")
+    area.add_argument("--poligono", help="Arquivo GeoJSON com o polígono a varrer")
+    parser.add_argument("--cidade", default=SEARCH_CONFIG["default_city"], help="Cidade")
+    parser.add_argument("--estado", default="SP", help="Estado")
+    parser.add_argument("--raio", type=int, default=2000, help="Raio ao redor do bairro (metros)")
+    parser.add_argument("--shard", default="0/1", help="Partição i/n dos tiles (ex: 2/8)")
+    parser.add_argument("--embeddings", action="store_true", help="Calcular embeddings CLIP")
+    parser.add_argument(
+        "--regiao",
+        help="Inserir as imagens no índice ANN desta região (implica --embeddings)"
+    )
+
+    args = parser.parse_args()
+    shard, n_shards = (int(v) for v in args.shard.split("/"))
+
+    agent = SearchAgent()
+    if agent.catalog is None:
+        raise SystemExit("Catálogo desligado (SEARCH_CONFIG['use_precrawl'] = False)")
+
+    matcher = None
+    if args.embeddings or args.regiao:
+        from agents.matching_agent import MatchingAgent
+        matcher = MatchingAgent()
+
+    tiles = tiles_da_area(agent.catalog, args)
+    meus = [t for t in tiles if no_shard(t, shard, n_shards)]
+    pendentes = [t for t in meus if not agent.catalog.is_done(t)]
+    logger.info(
+        f"{len(tiles)} tiles na área, {len(meus)} no shard {shard}/{n_shards}, "
+        f"{len(pendentes)} pendentes"
+    )
+
+    store_dir = OUTPUT_DIR / "street_views"
+    for k, tile_id in enumerate(pendentes, 1):
+        logger.info(f"[{k}/{len(pendentes)}] Varrendo tile {tile_id}")
+        varrer_tile(agent, store_dir, tile_id, matcher, regiao=args.regiao)
+
+    logger.info(f"✅ Shard {shard}/{n_shards} concluído")
+
+
+if __name__ == "__main__":
+    main()